@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Encoding of the NVTX markers inserted by pyprof.
+
+A marker is a JSON object prefixed by a short header e.g.
+	@pyprof1:{"mod":"torch","op":"add","args":[...]}
+The header carries the version of the encoding, so that parsers can detect
+the format with a single startswith() and without parsing the payload.
+Markers without the header are in the legacy format, str(dict).
+"""
+
+import json
+
+PREFIX = "@pyprof"
+VERSION = 1
+HEADER = "{}{}:".format(PREFIX, VERSION)
+
+
+def encode(d):
+    """
+	Encode a marker dictionary.
+	Tuples are stored as JSON arrays. Values which are not JSON
+	serializable are stored as their string representation.
+	"""
+    return HEADER + json.dumps(d, separators=(",", ":"), default=str)
@@ -31,6 +31,8 @@ The NVTX markers (one or more) contain the following information
 		tensor: name, shape and datatype
 		numpy: name, shape and datatype
 		list/tuple: a sequence of scalars or tensors or numpy arrays
+
+The markers are encoded as versioned JSON (see encoding.py).
 """
 
 import torch
@@ -42,6 +44,8 @@ import math
 import json
 import importlib
 
+from .encoding import encode
+
 
 def isfunc(mod, f):
     assert hasattr(mod, f)
@@ -90,7 +94,7 @@ def traceMarker(stack):
         t = f"{fi.filename}:{fi.lineno}"
         cadena.append(t)
     d['traceMarker'] = cadena
-    return str(d)
+    return encode(d)
 
 
 def modMarker(mod, fn_name, args):
@@ -101,7 +105,7 @@ def modMarker(mod, fn_name, args):
     d = {}
     d['mod'] = mod.__name__
     d['strRepr'] = args[0].extra_repr()
-    return str(d)
+    return encode(d)
 
 
 def add_wrapper(mod, fn_name):
@@ -240,7 +244,7 @@ def argMarker(mod, op, args, kwargs):
     for k, v in kwargs.items():
         foo((v, ), k)
 
-    return str(cadena)
+    return encode(cadena)
 
 
 def patchClass(cls):
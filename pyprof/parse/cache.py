@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Sidecar cache of parse results.
+
+The attributed kernel records of a database are stored next to it in
+<database>.pyprof-cache, in the binary interchange format. The cache is
+valid as long as the fingerprint matches i.e.
+	file size and modification time of the database
+	hash of the first pages of the database (SQLite header and schema)
+	hash of the parser source code
+	options which change the output of the parser
+"""
+
+import glob
+import hashlib
+import json
+import os
+import struct
+import sys
+
+from .interchange import BinaryWriter, BinaryReader, MAGIC as BINARY_MAGIC
+
+MAGIC = b"PYPROFC1"
+HEADER_BYTES = 64 * 1024
+
+_len = struct.Struct("<I")
+
+
+def parserVersion():
+    """
+	Hash of the source code of pyprof.parse (and the marker encoding).
+	Upgrading pyprof invalidates the caches.
+	"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    files = sorted(glob.glob(os.path.join(here, "*.py")))
+    files.append(os.path.join(here, "..", "nvtx", "encoding.py"))
+    h = hashlib.sha1()
+    for fileName in files:
+        with open(fileName, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def fingerprint(dbFile, options):
+    st = os.stat(dbFile)
+    with open(dbFile, "rb") as f:
+        header = hashlib.sha1(f.read(HEADER_BYTES)).hexdigest()
+    return {
+        'size': st.st_size,
+        'mtime': st.st_mtime_ns,
+        'header': header,
+        'parser': parserVersion(),
+        'options': options,
+    }
+
+
+class ResultCache(object):
+    """
+	Read and write the sidecar cache of a database.
+	"""
+
+    def __init__(self, dbFile, options):
+        self.path = dbFile + ".pyprof-cache"
+        self.tmpPath = self.path + ".tmp{}".format(os.getpid())
+        self.key = fingerprint(dbFile, options)
+        self.f = None
+
+    def load(self):
+        """
+		Return an iterator of kernel dictionaries if the cache is valid, None otherwise.
+		"""
+        try:
+            f = open(self.path, "rb")
+        except IOError:
+            return None
+
+        magic = f.read(len(MAGIC))
+        n = f.read(_len.size)
+        if (magic != MAGIC) or (len(n) != _len.size):
+            f.close()
+            return None
+        key = f.read(_len.unpack(n)[0])
+        try:
+            valid = (json.loads(key.decode("utf-8")) == self.key)
+        except ValueError:
+            valid = False
+        if not valid or (f.read(len(BINARY_MAGIC)) != BINARY_MAGIC):
+            f.close()
+            return None
+
+        def kernels():
+            with f:
+                for d in BinaryReader(f):
+                    yield d
+
+        return kernels()
+
+    def writer(self):
+        """
+		Return a BinaryWriter for a new cache. Returns None if the cache
+		cannot be created e.g. the directory is read only.
+		"""
+        try:
+            self.f = open(self.tmpPath, "wb")
+        except IOError as e:
+            print("Not caching the parse results: {}".format(e), file=sys.stderr)
+            return None
+        key = json.dumps(self.key).encode("utf-8")
+        self.f.write(MAGIC)
+        self.f.write(_len.pack(len(key)))
+        self.f.write(key)
+        return BinaryWriter(self.f)
+
+    def commit(self):
+        """
+		Atomically replace the cache with the one just written.
+		"""
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+            os.replace(self.tmpPath, self.path)
+
+    def abort(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+            os.remove(self.tmpPath)
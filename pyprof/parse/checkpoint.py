@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Checkpoints of a long parse.py run (--checkpoint-every, --resume).
+
+Every N kernels the output file is synced to the disk and
+<output>.pyprof-checkpoint records (as JSON)
+	the number of kernels written and the size of the output at that point
+	the state of sequenceKernel (prevSeqId, prevSubSeqId, prevOp)
+	the marker attribution cursor of the backend (getCursor)
+	the fingerprint of the database and the options, as for the result cache
+--resume truncates the output to the checkpointed size, restores the state
+and continues with the next kernel. The checkpoint is removed once the
+output is complete.
+"""
+
+import json
+import os
+import sys
+
+from .cache import fingerprint
+
+
+class Checkpoint(object):
+    """
+	Read and write the checkpoint of an output file.
+	"""
+
+    defaultEvery = 100000
+
+    def __init__(self, output, dbFile, options, every=None):
+        self.path = output + ".pyprof-checkpoint"
+        self.tmpPath = self.path + ".tmp"
+        self.key = fingerprint(dbFile, options)
+        self.every = every if every is not None else Checkpoint.defaultEvery
+
+    def load(self):
+        """
+		Return the last checkpoint, or None if there is none.
+		Exits if the checkpoint belongs to another database, parser or options.
+		"""
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except IOError:
+            return None
+        except ValueError as e:
+            print("Invalid checkpoint {}: {}".format(self.path, e), file=sys.stderr)
+            sys.exit(1)
+
+        if data.get('key') != self.key:
+            print(
+                "The checkpoint {} was written for another database, parser version or options.".format(self.path),
+                file=sys.stderr
+            )
+            sys.exit(1)
+        return data
+
+    def save(self, kernels, offset, state, cursor):
+        """
+		Atomically replace the checkpoint. The output must be synced up to offset.
+		"""
+        data = {
+            'key': self.key,
+            'every': self.every,
+            'kernels': kernels,
+            'offset': offset,
+            'state': state,
+            'cursor': cursor,
+        }
+        with open(self.tmpPath, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.tmpPath, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
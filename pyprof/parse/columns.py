@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Columnar kernel loading (--columnar).
+
+Instead of a dictionary per kernel, the kernel / runtime join (kernelSelect
+of the backend) is read into a NumPy structured array. Sorting, the sanity
+checks, durations, pid / tid decoding and the object ids are computed on the
+columns, and every kernel name is looked up once. Kernel records are filled
+chunk by chunk from plain lists, the markers are attributed to them as before.
+"""
+
+import numpy as np
+
+from .kernel import Kernel
+
+types = ["kernel", "memcpy", "memset"]
+
+
+class KernelTable(object):
+    """
+	The kernels (and memcpy / memset activities) of a profile in columns.
+	"""
+
+    #kernelSelect columns which are NULL for memcpy and memset, stored as -1
+    nullable = [
+        "kNameId", "gridX", "gridY", "gridZ", "blockX", "blockY", "blockZ", "bytes", "copyKind", "srcKind", "dstKind"
+    ]
+
+    def __init__(self, nvvp, profStart):
+        self.nvvp = nvvp
+        names = ["kNameId", "rStart", "rEnd"] + nvvp.threadColumns + [
+            "correlationId", "start", "end", "deviceId", "streamId", "gridX", "gridY", "gridZ", "blockX", "blockY",
+            "blockZ", "bytes", "copyKind", "srcKind", "dstKind"
+        ]
+        dtype = [("type", "i1")] + [(name, "i8") for name in names]
+        columns = ["CASE type WHEN 'kernel' THEN 0 WHEN 'memcpy' THEN 1 ELSE 2 END"]
+        columns += ["coalesce({0}, -1) AS {0}".format(name) if name in self.nullable else name for name in names]
+        cmd = "SELECT {} FROM ({})".format(", ".join(columns), nvvp.kernelSelect(ordered=False))
+        t = nvvp.db.select_array(cmd, dtype)
+
+        if nvvp.memory:
+            #Kernels, memcpy and memset in order of GPU start time
+            t = t[np.argsort(t['start'], kind="stable")]
+
+        isKernel = t['type'] == 0
+        assert np.all(t['end'][isKernel] > t['start'][isKernel]), \
+         "This assertion can fail for very large profiles. It usually fails when start = end = 0."
+        #Tiny memsets can be reported with zero duration
+        assert np.all(t['end'] >= t['start'])
+        assert np.all(t['start'] > profStart)
+        assert np.all(t['rStart'] < t['rEnd'])
+        assert np.all(t['rStart'] < t['start'])
+
+        self.columns = t
+        self.duration = t['end'] - t['start']
+        self.rDuration = t['rEnd'] - t['rStart']
+        self.pid, self.tid, self.objId = nvvp.decodeThreads(t)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def launches(self):
+        """
+		The (objId, rStart, rEnd) of every kernel for attributeLaunches.
+		"""
+        return zip(self.objId.tolist(), self.columns['rStart'].tolist(), self.columns['rEnd'].tolist())
+
+    def kernels(self, start=0, size=10000):
+        """
+		Generate a Kernel with the kernel and runtime info of every row from start.
+		"""
+        t = self.columns
+        names = {
+            nameId: Kernel.names.get(nameId, self.nvvp.getString(nameId))
+            for nameId in np.unique(t['kNameId'][t['type'] == 0]).tolist()
+        }
+
+        for lo in range(start, len(t), size):
+            hi = lo + size
+            c = {name: t[name][lo:hi].tolist() for name in t.dtype.names}
+            kNameId = [None if n == -1 else n for n in c['kNameId']]
+            rows = zip(
+                [types[x] for x in c['type']],
+                kNameId,
+                c['correlationId'],
+                c['start'],
+                c['end'],
+                self.duration[lo:hi].tolist(),
+                c['deviceId'],
+                c['streamId'],
+                zip(c['gridX'], c['gridY'], c['gridZ']),
+                zip(c['blockX'], c['blockY'], c['blockZ']),
+                c['rStart'],
+                c['rEnd'],
+                self.rDuration[lo:hi].tolist(),
+                self.pid[lo:hi].tolist(),
+                self.tid[lo:hi].tolist(),
+                self.objId[lo:hi].tolist(),
+                [names.get(n) for n in kNameId],
+                zip(c['bytes'], c['copyKind'], c['srcKind'], c['dstKind']),
+            )
+            for row in rows:
+                k = Kernel()
+                k.setKernelRow(row)
+                yield k
@@ -16,19 +16,41 @@
 # limitations under the License.
 
 import sys, sqlite3
+import numpy as np
+from urllib.request import pathname2url
 
 
 class DB(object):
     """
 	This class provides functions for DB operations
 	with exception handling.
+
+	readOnly : Open the database with a read-only URI. Temporary tables can still be created.
+	mmapSize : PRAGMA mmap_size in bytes i.e. read the database through a memory map.
+	cacheSize: PRAGMA cache_size i.e. pages (positive) or KiB (negative) of page cache.
+	tempStore: PRAGMA temp_store e.g. MEMORY to keep temporary tables and indices in memory.
+	None leaves the SQLite default.
+
+	Queries may contain ? placeholders for params. sqlite3 caches the prepared
+	statement of every distinct query string, so a query which is run once per
+	kernel with different params is compiled only once.
 	"""
 
-    def __init__(self, dbFile):
+    def __init__(self, dbFile, readOnly=False, mmapSize=None, cacheSize=None, tempStore=None):
         try:
-            conn = sqlite3.connect(dbFile)
+            if readOnly:
+                conn = sqlite3.connect("file:{}?mode=ro".format(pathname2url(dbFile)), uri=True, cached_statements=256)
+            else:
+                conn = sqlite3.connect(dbFile, cached_statements=256)
             conn.row_factory = sqlite3.Row
             c = conn.cursor()
+            if mmapSize is not None:
+                c.execute("PRAGMA mmap_size = {:d}".format(mmapSize))
+            if cacheSize is not None:
+                c.execute("PRAGMA cache_size = {:d}".format(cacheSize))
+            if tempStore is not None:
+                assert (tempStore in ["DEFAULT", "FILE", "MEMORY"])
+                c.execute("PRAGMA temp_store = {}".format(tempStore))
         except:
             print("Error opening {}".format(dbFile))
             sys.exit(1)
@@ -36,9 +58,9 @@ class DB(object):
         self.conn = conn
         self.c = c
 
-    def select(self, cmd):
+    def select(self, cmd, params=()):
         try:
-            self.c.execute(cmd)
+            self.c.execute(cmd, params)
             #rows = self.c.fetchall()
             rows = [dict(row) for row in self.c.fetchall()]
         except sqlite3.Error as e:
@@ -51,6 +73,49 @@ class DB(object):
         #print(rows)
         return rows
 
+    def iter_select(self, cmd, params=(), size=10000):
+        """
+		Generator version of select. Rows are fetched in batches of size
+		rows so that the whole result is never held in memory.
+		A separate cursor is used so that other queries can be run
+		while the result is being consumed.
+		"""
+        try:
+            c = self.conn.cursor()
+            c.execute(cmd, params)
+            while True:
+                rows = c.fetchmany(size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+            c.close()
+        except sqlite3.Error as e:
+            print(e)
+            sys.exit(1)
+
+    def select_array(self, cmd, dtype, params=(), size=100000):
+        """
+		Return the result of a query as a NumPy structured array of dtype.
+		The columns of the query must match the fields of dtype and must not be NULL.
+		Rows are fetched as tuples in batches of size rows and converted batch by batch.
+		"""
+        try:
+            c = self.conn.cursor()
+            c.row_factory = None
+            c.execute(cmd, params)
+            chunks = []
+            while True:
+                rows = c.fetchmany(size)
+                if not rows:
+                    break
+                chunks.append(np.array(rows, dtype=dtype))
+            c.close()
+        except sqlite3.Error as e:
+            print(e)
+            sys.exit(1)
+        return np.concatenate(chunks) if len(chunks) else np.empty(0, dtype=dtype)
+
     def insert(self, cmd, data):
         try:
             self.c.execute(cmd, data)
@@ -61,9 +126,9 @@ class DB(object):
             print("Uncaught error in SQLite access while executing {}".format(cmd))
             sys.exit(1)
 
-    def execute(self, cmd):
+    def execute(self, cmd, params=()):
         try:
-            self.c.execute(cmd)
+            self.c.execute(cmd, params)
         except sqlite3.Error as e:
             print(e)
             sys.exit(1)
@@ -71,6 +136,13 @@ class DB(object):
             print("Uncaught error in SQLite access while executing {}".format(cmd))
             sys.exit(1)
 
+    def hasTable(self, table):
+        """
+		True if the database has a table with this name.
+		"""
+        cmd = "SELECT COUNT(*) AS count FROM sqlite_master WHERE type = 'table' AND name = ?"
+        return self.select(cmd, (table, ))[0]['count'] > 0
+
     def commit(self):
         self.conn.commit()
 
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Interchange formats between pyprof.parse and pyprof.prof.
+
+text: One Python dictionary per kernel and line (the default).
+bin : A compact binary format. It starts with MAGIC and is followed by records
+      (1 byte tag, 4 byte payload length, payload).
+	H: Schema i.e. a list of (field name, type code). Applies to the following K records.
+	S: A UTF-8 string. Strings are numbered in order of appearance.
+	K: A kernel. The fields of the schema in order. Numbers are fixed width,
+	   strings are references to S records, so repeated markers, traces and
+	   kernel names are stored only once.
+
+Type codes
+	q: int          d: float        b: bool         n: None
+	s: str          S: list of str  U: tuple of str
+	I: list of int  T: tuple of int r: anything else (repr stored as a string)
+
+Both formats can be compressed with gzip, bz2 or xz (standard library only).
+Output compression is chosen by the file extension (or explicitly), input
+compression is detected from the magic bytes.
+"""
+
+import ast
+import bz2
+import gzip
+import io
+import lzma
+import os
+import struct
+
+MAGIC = b"PYPROFB1"
+
+#Compressed streams are read and written in large chunks
+BUFFER_SIZE = 1 << 20
+
+#Kernels are serialized in batches of this many bytes to limit the number of writes
+BATCH_SIZE = 1 << 18
+
+#name: (file extensions, magic bytes)
+COMPRESSION = {
+    "gzip": ([".gz", ".gzip"], b"\x1f\x8b"),
+    "bz2": ([".bz2"], b"BZh"),
+    "xz": ([".xz", ".lzma"], b"\xfd7zXZ\x00"),
+}
+
+_len = struct.Struct("<I")
+_header = struct.Struct("<cI")
+_scalarCodes = {int: "q", float: "d", bool: "b", str: "s", type(None): "n"}
+
+
+def typeCode(value):
+    """
+	Return the type code of a value.
+	"""
+    t = type(value)
+    code = _scalarCodes.get(t)
+    if code is not None:
+        return code
+    elif t in (list, tuple):
+        if all(type(x) is str for x in value):
+            return "S" if t is list else "U"
+        elif all(type(x) is int for x in value):
+            return "I" if t is list else "T"
+    return "r"
+
+
+class BinaryWriter(object):
+    """
+	Write kernel dictionaries in the binary format.
+	"""
+
+    def __init__(self, stream, strings=None, schema=None):
+        """
+		strings and schema continue an existing output (see scanBinary),
+		otherwise a new output is started with MAGIC.
+		"""
+        self.stream = stream
+        self.strings = {}
+        self.schema = schema
+        if strings is None:
+            self.stream.write(MAGIC)
+        else:
+            self.strings = {s: id_ for id_, s in enumerate(strings)}
+
+    def record(self, tag, payload):
+        self.stream.write(_header.pack(tag, len(payload)) + payload)
+
+    def string(self, s):
+        """
+		Return the id of a string, defining it first if required.
+		"""
+        id_ = self.strings.get(s)
+        if id_ is None:
+            id_ = len(self.strings)
+            self.strings[s] = id_
+            self.record(b"S", s.encode("utf-8"))
+        return id_
+
+    def setSchema(self, d):
+        self.schema = [(name, typeCode(value)) for name, value in d.items()]
+        payload = ",".join("{}:{}".format(name, code) for name, code in self.schema)
+        self.record(b"H", payload.encode("utf-8"))
+
+    def pack(self, d):
+        """
+		Return the payload of the K record of d, or None if d does not fit the schema.
+		"""
+        fmt = ["<"]
+        values = []
+        strings = self.strings
+        for name, code in self.schema:
+            try:
+                v = d[name]
+            except KeyError:
+                return None
+            t = type(v)
+            if code in "qdbsn":
+                if _scalarCodes.get(t) != code:
+                    return None
+                if code == "s":
+                    fmt.append("I")
+                    id_ = strings.get(v)
+                    values.append(id_ if id_ is not None else self.string(v))
+                elif code != "n":
+                    fmt.append(code if code != "b" else "?")
+                    values.append(v)
+            elif code in "SU":
+                if t is not (list if code == "S" else tuple):
+                    return None
+                fmt.append("I{}I".format(len(v)))
+                values.append(len(v))
+                for x in v:
+                    if type(x) is not str:
+                        return None
+                    id_ = strings.get(x)
+                    values.append(id_ if id_ is not None else self.string(x))
+            elif code in "IT":
+                if (t is not (list if code == "I" else tuple)) or not all(type(x) is int for x in v):
+                    return None
+                fmt.append("I{}q".format(len(v)))
+                values.append(len(v))
+                values.extend(v)
+            elif code == "r":
+                if typeCode(v) != "r":
+                    return None
+                fmt.append("I")
+                values.append(self.string(repr(v)))
+        return struct.pack("".join(fmt), *values)
+
+    def write(self, d):
+        payload = None
+        if (self.schema is not None) and (len(self.schema) == len(d)):
+            payload = self.pack(d)
+        if payload is None:
+            self.setSchema(d)
+            payload = self.pack(d)
+        self.record(b"K", payload)
+
+    def close(self):
+        self.stream.flush()
+
+
+class BinaryReader(object):
+    """
+	Read kernel dictionaries from the binary format.
+	The stream must be positioned after MAGIC.
+	"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.strings = []
+        self.schema = None
+
+    def kernel(self, payload):
+        d = {}
+        strings = self.strings
+        offset = 0
+        for name, code in self.schema:
+            if code == "q":
+                d[name], = struct.unpack_from("<q", payload, offset)
+                offset += 8
+            elif code == "d":
+                d[name], = struct.unpack_from("<d", payload, offset)
+                offset += 8
+            elif code == "b":
+                d[name], = struct.unpack_from("<?", payload, offset)
+                offset += 1
+            elif code == "n":
+                d[name] = None
+            elif code == "s":
+                id_, = _len.unpack_from(payload, offset)
+                d[name] = strings[id_]
+                offset += 4
+            elif code in "SU":
+                n, = _len.unpack_from(payload, offset)
+                ids = struct.unpack_from("<{}I".format(n), payload, offset + 4)
+                offset += 4 + 4 * n
+                v = [strings[i] for i in ids]
+                d[name] = v if code == "S" else tuple(v)
+            elif code in "IT":
+                n, = _len.unpack_from(payload, offset)
+                v = struct.unpack_from("<{}q".format(n), payload, offset + 4)
+                offset += 4 + 8 * n
+                d[name] = list(v) if code == "I" else v
+            elif code == "r":
+                id_, = _len.unpack_from(payload, offset)
+                d[name] = ast.literal_eval(strings[id_])
+                offset += 4
+            else:
+                assert False, "Unknown type code {}".format(code)
+        return d
+
+    def __iter__(self):
+        read = self.stream.read
+        while True:
+            header = read(_header.size)
+            if len(header) == 0:
+                break
+            assert (len(header) == _header.size), "Truncated record header."
+            tag, n = _header.unpack(header)
+            payload = read(n)
+            assert (len(payload) == n), "Truncated record."
+            if tag == b"K":
+                yield self.kernel(payload)
+            elif tag == b"S":
+                self.strings.append(payload.decode("utf-8"))
+            elif tag == b"H":
+                self.schema = [tuple(field.rsplit(":", 1)) for field in payload.decode("utf-8").split(",")]
+            else:
+                assert False, "Unknown record {}".format(tag)
+
+
+class BatchedStream(object):
+    """
+	Collect small writes in memory and pass them on to a binary stream
+	in chunks of at least size bytes.
+	"""
+
+    def __init__(self, stream, size=BATCH_SIZE):
+        self.stream = stream
+        self.size = size
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= self.size:
+            self.stream.write(self.buffer)
+            self.buffer = bytearray()
+
+    def flush(self):
+        if len(self.buffer):
+            self.stream.write(self.buffer)
+            self.buffer = bytearray()
+        self.stream.flush()
+
+
+def scanBinary(stream):
+    """
+	Return the strings and the last schema of the binary format in stream
+	(positioned after MAGIC), without decoding the kernels.
+	"""
+    strings = []
+    schema = None
+    while True:
+        header = stream.read(_header.size)
+        if len(header) < _header.size:
+            break
+        tag, n = _header.unpack(header)
+        if tag == b"K":
+            stream.seek(n, io.SEEK_CUR)
+            continue
+        payload = stream.read(n)
+        if tag == b"S":
+            strings.append(payload.decode("utf-8"))
+        elif tag == b"H":
+            schema = [tuple(field.rsplit(":", 1)) for field in payload.decode("utf-8").split(",")]
+    return strings, schema
+
+
+class KernelWriter(object):
+    """
+	Write kernel dictionaries to a binary stream in the text or the binary format.
+	Kernels are serialized in batches, nothing reaches the stream before
+	a batch is full or close is called.
+	"""
+
+    def __init__(self, stream, fmt="text", batch=1024):
+        assert (fmt in ["text", "bin"])
+        self.stream = BatchedStream(stream)
+        self.fmt = fmt
+        self.batch = batch
+        self.lines = []
+        self.writer = None
+
+    def write(self, d):
+        if self.fmt == "text":
+            self.lines.append(str(d))
+            if len(self.lines) >= self.batch:
+                self.writeLines()
+        else:
+            if self.writer is None:
+                self.writer = BinaryWriter(self.stream)
+            self.writer.write(d)
+
+    def writeLines(self):
+        self.lines.append("")
+        self.stream.write("\n".join(self.lines).encode("utf-8"))
+        self.lines = []
+
+    def resume(self):
+        """
+		Continue the output in the underlying stream, a file opened with resumeOutput.
+		The binary format needs the strings and the schema written so far.
+		"""
+        f = self.stream.stream
+        end = f.tell()
+        if (self.fmt == "bin") and (end > 0):
+            f.seek(0)
+            assert (f.read(len(MAGIC)) == MAGIC), "The output is not in the binary format."
+            strings, schema = scanBinary(f)
+            f.seek(end)
+            self.writer = BinaryWriter(self.stream, strings, schema)
+
+    def sync(self):
+        """
+		Write everything to the underlying file and to the disk.
+		Returns the size of the output so far.
+		"""
+        if len(self.lines):
+            self.writeLines()
+        self.stream.flush()
+        f = self.stream.stream
+        os.fsync(f.fileno())
+        return f.tell()
+
+    def close(self):
+        if len(self.lines):
+            self.writeLines()
+        self.stream.flush()
+
+
+def readKernels(stream):
+    """
+	Return an iterator of kernel dictionaries.
+	stream is a binary stream holding either the text or the binary format.
+	"""
+    head = stream.peek(len(MAGIC))[:len(MAGIC)] if hasattr(stream, "peek") else b""
+    if head == MAGIC:
+        stream.read(len(MAGIC))
+        return iter(BinaryReader(stream))
+    else:
+        text = io.TextIOWrapper(stream, encoding="utf-8")
+        return (eval(line) for line in text)
+
+
+def compressionOf(fileName):
+    """
+	Return the compression (gzip, bz2, xz) implied by the extension of a file name, or None.
+	"""
+    for name, (extensions, _) in COMPRESSION.items():
+        if any(fileName.endswith(ext) for ext in extensions):
+            return name
+    return None
+
+
+def compressedWriter(target, compression):
+    """
+	Return a buffered compressed binary output stream.
+	target is a file name or a binary stream. Closing the returned stream
+	closes a file opened by name, but leaves a stream open.
+	"""
+    if compression == "gzip":
+        #Level 6 is much faster than the default 9 and almost as small
+        raw = gzip.open(target, "wb", compresslevel=6)
+    elif compression == "bz2":
+        raw = bz2.open(target, "wb")
+    elif compression == "xz":
+        raw = lzma.open(target, "wb")
+    else:
+        assert False, "Unknown compression {}".format(compression)
+    return io.BufferedWriter(raw, buffer_size=BUFFER_SIZE)
+
+
+def openOutput(fileName, compression=None):
+    """
+	Open a file for writing, compressed as given or as implied by its extension.
+	"""
+    if compression is None:
+        compression = compressionOf(fileName)
+    if compression is None:
+        return open(fileName, "wb", buffering=BUFFER_SIZE)
+    return compressedWriter(fileName, compression)
+
+
+def resumeOutput(fileName, offset):
+    """
+	Open an uncompressed output file to continue writing at offset.
+	Everything after offset is discarded.
+	"""
+    f = open(fileName, "r+b", buffering=BUFFER_SIZE)
+    f.truncate(offset)
+    f.seek(offset)
+    return f
+
+
+def decompressed(stream):
+    """
+	Return a buffered binary stream with the decompressed content of stream
+	if it starts with the magic bytes of gzip, bz2 or xz and stream itself otherwise.
+	"""
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream, buffer_size=BUFFER_SIZE)
+    head = stream.peek(8)
+    if head.startswith(COMPRESSION["gzip"][1]):
+        raw = gzip.open(stream, "rb")
+    elif head.startswith(COMPRESSION["bz2"][1]):
+        raw = bz2.open(stream, "rb")
+    elif head.startswith(COMPRESSION["xz"][1]):
+        raw = lzma.open(stream, "rb")
+    else:
+        return stream
+    return io.BufferedReader(raw, buffer_size=BUFFER_SIZE)
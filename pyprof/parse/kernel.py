@@ -16,6 +16,10 @@
 # limitations under the License.
 
 import cxxfilt, struct, binascii
+import os, sqlite3
+
+from .markers import decode
+from .selfprofile import stage
 
 #Helper functions
 
@@ -46,15 +50,111 @@ def getShortName(name):
     return sname
 
 
+class NameCache(object):
+    """
+	Cache of demangled and short kernel names.
+	A profile has a few hundred distinct kernel names repeated millions of times.
+	In memory, the names are cached by the kernel name id of the database.
+	Optionally, the names are also stored in a SQLite3 file keyed by the
+	mangled name so that later runs (on any profile) skip demangling.
+	"""
+
+    def __init__(self, path=None):
+        self.names = {}
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+        self.path = path
+        self.conn = None
+        self.new = []
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.conn = sqlite3.connect(path, timeout=60)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS names (mangled TEXT PRIMARY KEY, demangled TEXT)")
+
+    @staticmethod
+    def defaultPath():
+        cache = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+        return os.path.join(cache, "pyprof", "names.sqlite")
+
+    def get(self, nameId, name):
+        """
+		Return the (long, short) name of a kernel.
+		"""
+        if nameId in self.names:
+            self.hits += 1
+            return self.names[nameId]
+
+        longName = None
+        if self.conn is not None:
+            row = self.conn.execute("SELECT demangled FROM names WHERE mangled = ?", (name, )).fetchone()
+            if row is not None:
+                longName = row[0]
+                self.diskHits += 1
+
+        if longName is None:
+            self.misses += 1
+            with stage("demangle"):
+                longName = demangle(name)
+            if self.conn is not None:
+                self.new.append((name, longName))
+
+        names = (longName, getShortName(longName))
+        self.names[nameId] = names
+        return names
+
+    def close(self):
+        """
+		Write the newly demangled names in a single transaction.
+		"""
+        if self.conn is not None:
+            with self.conn:
+                self.conn.executemany("INSERT OR IGNORE INTO names VALUES (?, ?)", self.new)
+            self.conn.close()
+            self.conn = None
+            self.new = []
+
+    def stats(self):
+        return {'hits': self.hits, 'diskHits': self.diskHits, 'misses': self.misses}
+
+    @staticmethod
+    def report(stats):
+        """
+		Return a one line summary of (merged) stats.
+		"""
+        lookups = stats['hits'] + stats['diskHits'] + stats['misses']
+        if lookups == 0:
+            return "Kernel names: 0 lookups."
+        return "Kernel names: {} lookups, {:.2f}% in-memory hits, {:.2f}% disk cache hits, {} demangled.".format(
+            lookups, 100.0 * stats['hits'] / lookups, 100.0 * stats['diskHits'] / lookups, stats['misses']
+        )
+
+
 class Kernel(object):
     """
 	This class stores information about a kernel.
+	Millions of kernels are created for a long profile, so the attributes
+	are slots and the marker lists are only allocated by setMarkerInfo.
 	"""
 
+    __slots__ = (
+        "type", "kNameId", "kShortName", "kLongName", "kStartTime", "kEndTime", "kDuration", "device", "stream", "grid",
+        "block", "corrId", "rStartTime", "rEndTime", "rDuration", "tid", "pid", "objId", "timeOffset", "queueDepth",
+        "bytes", "copyKind", "hostMem", "layerMarkers", "traceMarkers", "reprMarkers", "pyprofMarkers", "seqMarkers",
+        "otherMarkers", "altMarkers", "seqId", "altSeqId", "layer", "subSeqId", "dir", "mod", "op", "altSeqRequest"
+    )
+
     kernels = []
     profStart = 0
+    names = NameCache()
+
+    #CUpti_ActivityMemcpyKind
+    copyKinds = ["Unknown", "HtoD", "DtoH", "HtoA", "AtoH", "AtoA", "AtoD", "DtoA", "DtoD", "HtoH", "PtoP"]
+    #CUpti_ActivityMemoryKind
+    memKinds = ["unknown", "pageable", "pinned", "device", "array", "managed", "device_static", "managed_static"]
 
     def __init__(self):
+        self.type = "kernel"  #kernel, memcpy or memset
         self.kNameId = None
         self.kShortName = None
         self.kLongName = None
@@ -73,29 +173,36 @@ class Kernel(object):
         self.pid = None
         self.objId = None
         self.timeOffset = None
+        self.queueDepth = 0  #launched but not started kernels on the device at launch
+
+        #memcpy and memset only
+        self.bytes = None
+        self.copyKind = None
+        self.hostMem = None  #memory kind (pinned, pageable ...) of the host side of a memcpy or of a memset
 
-        self.layerMarkers = []
-        self.traceMarkers = []
-        self.reprMarkers = []
-        self.pyprofMarkers = []
-        self.seqMarkers = []
-        self.otherMarkers = []
-        self.altMarkers = []
-        self.seqId = []
-        self.altSeqId = []
-        self.layer = []
+        #Replaced by setMarkerInfo
+        self.layerMarkers = self.traceMarkers = self.reprMarkers = self.pyprofMarkers = self.seqMarkers = ()
+        self.otherMarkers = self.altMarkers = self.seqId = self.altSeqId = self.layer = ()
 
         self.subSeqId = None
         self.dir = None
         self.mod = []
         self.op = []
+        self.altSeqRequest = None  #set by the workers of --jobs
 
     def setKernelInfo(self, info):
+        self.type = info.get('type', "kernel")
         self.kNameId = info['kNameId']
         self.corrId = int(info['correlationId'])
         start = int(info['start'])
         end = int(info['end'])
-        assert end > start, "This assertion can fail for very large profiles. It usually fails when start = end = 0."
+        if self.type == "kernel":
+            assert end > start, (
+                "This assertion can fail for very large profiles. It usually fails when start = end = 0."
+            )
+        else:
+            #Tiny memsets can be reported with zero duration
+            assert end >= start
         self.kStartTime = start
         self.kEndTime = end
         self.kDuration = end - start
@@ -105,13 +212,52 @@ class Kernel(object):
         self.grid = (info['gridX'], info['gridY'], info['gridZ'])
         self.block = (info['blockX'], info['blockY'], info['blockZ'])
         self.timeOffset = Kernel.profStart
-        self.setKernelName(info['name'])
+        if self.type == "kernel":
+            self.setKernelName(info['name'], info['kNameId'])
+        else:
+            self.setMemoryInfo(info)
         self.setRunTimeInfo(info)
 
-    def setKernelName(self, name):
-        cadena = demangle(name)
-        self.kLongName = cadena
-        self.kShortName = getShortName(cadena)
+    def setMemoryInfo(self, info):
+        """
+		Set the name, size and memory kinds of a memcpy or memset.
+		The names follow NVprof e.g. [CUDA memcpy HtoD].
+		"""
+        self.setMemory(info['bytes'], info['copyKind'], info['srcKind'], info['dstKind'])
+
+    def setMemory(self, nbytes, copyKind, srcKind, dstKind):
+        self.grid = ()
+        self.block = ()
+        self.bytes = int(nbytes)
+        if self.type == "memcpy":
+            self.copyKind = Kernel.copyKinds[copyKind] if 0 <= copyKind < len(Kernel.copyKinds) else "Unknown"
+            #The host side is the source of HtoX and the destination of XtoH copies
+            if self.copyKind.startswith("H"):
+                self.hostMem = self.memKind(srcKind)
+            elif self.copyKind.endswith("H"):
+                self.hostMem = self.memKind(dstKind)
+            name = "[CUDA memcpy {}]".format(self.copyKind)
+        else:
+            self.hostMem = self.memKind(srcKind)
+            name = "[CUDA memset]"
+        self.kLongName = self.kShortName = name
+
+    @staticmethod
+    def memKind(kind):
+        if kind is None or not (0 <= kind < len(Kernel.memKinds)):
+            return "unknown"
+        return Kernel.memKinds[kind]
+
+    def bandwidth(self):
+        """
+		Achieved bandwidth of a memcpy or memset in GB/s (bytes per ns).
+		"""
+        return round(float(self.bytes) / self.kDuration, 3) if self.kDuration > 0 else 0.0
+
+    def setKernelName(self, name, nameId=None):
+        if nameId is None:
+            nameId = name
+        self.kLongName, self.kShortName = Kernel.names.get(nameId, name)
 
     def setRunTimeInfo(self, info):
         self.rStartTime = info['rStart']
@@ -123,6 +269,20 @@ class Kernel(object):
         assert (self.rStartTime < self.rEndTime)
         assert (self.rStartTime < self.kStartTime)
 
+    def setKernelRow(self, row):
+        """
+		Set the kernel and runtime info from a row of a KernelTable.
+		The checks, durations and names are done on the columns of the table.
+		"""
+        self.type, self.kNameId, self.corrId, self.kStartTime, self.kEndTime, self.kDuration, self.device, \
+         self.stream, self.grid, self.block, self.rStartTime, self.rEndTime, self.rDuration, self.pid, self.tid, \
+         self.objId, names, memory = row
+        self.timeOffset = Kernel.profStart
+        if self.type == "kernel":
+            self.kLongName, self.kShortName = names
+        else:
+            self.setMemory(*memory)
+
     def setMarkerInfo(self, info):
         self.layerMarkers, self.traceMarkers, self.reprMarkers, self.pyprofMarkers, self.seqMarkers, self.otherMarkers, self.altMarkers, self.seqId, self.altSeqId, self.layer = info
         self.subSeqId = 0
@@ -163,7 +323,7 @@ class Kernel(object):
         #Check pyprof markers
         for m in self.pyprofMarkers:
             assert ("mod" in m) and ("op" in m) and ("args" in m)
-            t = eval(m)
+            t = decode(m)
             self.op.append(t['op'])
             self.mod.append(t['mod'])
 
@@ -196,34 +356,49 @@ class Kernel(object):
             self.op.append(self.otherMarkers[0])
         self.mod.append('na')
 
+    def toDict(self):
+        """
+		Kernel information used by prof.py.
+		"""
+
+        d = {
+            'kShortName': self.kShortName,
+            'kDuration': self.kDuration,
+            'layer': self.layer,
+            'trace': self.traceMarkers,
+            'reprMarkers': self.reprMarkers,
+            'marker': self.pyprofMarkers,
+            'seqMarker': self.seqMarkers,
+            'seqId': self.seqId,
+            'subSeqId': self.subSeqId,
+            'altSeqId': self.altSeqId,
+            'dir': self.dir,
+            'mod': self.mod,
+            'op': self.op,
+            'tid': self.tid,
+            'pid': self.pid,
+            'device': self.device,
+            'stream': self.stream,
+            'grid': self.grid,
+            'block': self.block,
+            'kLongName': self.kLongName,
+            'start': self.kStartTime - self.timeOffset,  #ns from the start of the profile
+            'launch': self.rDuration,  #duration of the launch API call
+            'latency': self.kStartTime - self.rStartTime,  #launch to execution
+            'queueDepth': self.queueDepth,
+        }
+
+        if self.type != "kernel":
+            d['type'] = self.type
+            d['bytes'] = self.bytes
+            d['copyKind'] = self.copyKind
+            d['hostMem'] = self.hostMem
+            d['bandwidth'] = self.bandwidth()
+
+        return d
+
     def print(self):
         """
 		Print kernel information. This is used by prof.py.
 		"""
-
-        a = lambda: None
-        a.kShortName = self.kShortName
-        a.kDuration = self.kDuration
-        #a.layerMarkers = self.layerMarkers
-        a.layer = self.layer
-        a.trace = self.traceMarkers
-        a.reprMarkers = self.reprMarkers
-        a.marker = self.pyprofMarkers
-        a.seqMarker = self.seqMarkers
-
-        a.seqId = self.seqId
-        a.subSeqId = self.subSeqId
-        a.altSeqId = self.altSeqId
-
-        a.dir = self.dir
-        a.mod = self.mod
-        a.op = self.op
-
-        a.tid = self.tid
-        a.device = self.device
-        a.stream = self.stream
-        a.grid = self.grid
-        a.block = self.block
-        a.kLongName = self.kLongName
-
-        print(a.__dict__)
+        print(self.toDict())
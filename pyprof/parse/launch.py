@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+
+class LaunchQueue(object):
+    """
+	Depth of the launch queue of every device i.e. the number of kernels
+	which were launched (from any thread) but have not started on the GPU
+	when a kernel is launched. A kernel always starts after its launch, so
+	depth(t) = #launches before t - #kernels started at or before t.
+	A deep queue means the CPU runs ahead of the GPU, a queue which is
+	mostly empty means the model is bound by the CPU launch overhead.
+
+	The kernels are not emitted in launch order, so the queue keeps the
+	sorted launch and start times of every device: 16 bytes per kernel.
+	"""
+
+    def __init__(self, launches=((), ()), starts=((), ())):
+        """
+		launches, starts: (device, time) arrays of the launch (rStart) and the
+		GPU start of every kernel, sorted by device and time e.g. by SQLite.
+		There is no Python object per kernel.
+		"""
+        self.launches = self.group(*launches)
+        self.starts = self.group(*starts)
+
+    @staticmethod
+    def group(device, time):
+        """
+		Split the times, sorted by device, into one array of 8 byte integers per device.
+		"""
+        device = np.asarray(device, dtype=np.int64)
+        time = np.asarray(time, dtype=np.int64)
+        if len(device) == 0:
+            return {}
+        bounds = (np.flatnonzero(device[1:] != device[:-1]) + 1).tolist()
+        return {
+            int(device[lo]): array('q', time[lo:hi].tobytes())
+            for lo, hi in zip([0] + bounds, bounds + [len(device)])
+        }
+
+    def depth(self, device, rStart):
+        launches = self.launches.get(device)
+        if launches is None:
+            return 0
+        return bisect_left(launches, rStart) - bisect_right(self.starts[device], rStart)
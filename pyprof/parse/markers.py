@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Decoder for the NVTX markers inserted by pyprof, shared by parse and prof.
+"""
+
+import json
+
+from ..nvtx.encoding import PREFIX, VERSION
+
+_decoded = {}
+
+
+def _restoreTuples(d):
+    """
+	JSON has no tuples. Restore the tuples of the legacy format
+	(tensor / ndarray shapes and tuple arguments).
+	"""
+    for arg in d.get('args', []):
+        if type(arg) is not dict:
+            continue
+        if type(arg.get('shape')) is list:
+            arg['shape'] = tuple(arg['shape'])
+        if (arg.get('type') == "tuple") and (type(arg.get('value')) is list):
+            arg['value'] = tuple(arg['value'])
+    return d
+
+
+def decode(marker):
+    """
+	Decode a marker string into a dictionary.
+	Both the JSON encoding (with a version header) and the legacy
+	str(dict) format are supported.
+
+	Every distinct marker string is parsed only once. The dictionary is
+	shared by all callers and must not be modified.
+	"""
+    d = _decoded.get(marker)
+    if d is not None:
+        return d
+
+    if marker.startswith(PREFIX):
+        version, sep, payload = marker[len(PREFIX):].partition(":")
+        assert sep and version.isdigit(), "Malformed marker header."
+        assert int(version) <= VERSION, "Marker version {} is not supported.".format(version)
+        d = _restoreTuples(json.loads(payload))
+    else:
+        d = eval(marker)
+
+    _decoded[marker] = d
+    return d
+
+
+class MarkerClassifier(object):
+    """
+	Classify the NVTX markers enclosing a kernel launch.
+	The same few marker strings enclose millions of kernels, so every distinct
+	string is classified once and the result is cached by a key, the StringTable
+	id for NVprof and the textId (or the text itself) for Nsight.
+	The classification is (category, backward, value) where value is the seq id
+	of a seq marker, the layer name of a layer marker and None otherwise.
+	"""
+
+    PYPROF, LAYER, TRACE, REPR, SEQ, OTHER, IGNORE = range(7)
+
+    def __init__(self):
+        self.cache = {}
+
+    @staticmethod
+    def classify(m):
+        #Hack: If its a known gradient checkpointing marker, ignore it.
+        if m.find("CheckpointFunctionBackward") >= 0:
+            return MarkerClassifier.IGNORE, False, None
+
+        backward = ("_backward, seq =" in m) or ("Backward, seq =" in m) or ("Backward0, seq =" in m)
+
+        if ("mod" in m) and ("op" in m) and ("args" in m) and ("type" in m):
+            return MarkerClassifier.PYPROF, backward, None
+        elif ("layer:" in m):
+            return MarkerClassifier.LAYER, backward, m.split(":")[1]
+        elif ("traceMarker" in m):
+            return MarkerClassifier.TRACE, backward, None
+        elif ("strRepr" in m):
+            return MarkerClassifier.REPR, backward, None
+        elif (", seq = " in m):
+            return MarkerClassifier.SEQ, backward, int(m.split("=")[1])
+        else:
+            return MarkerClassifier.OTHER, backward, None
+
+    def get(self, key, m):
+        c = self.cache.get(key)
+        if c is None:
+            c = MarkerClassifier.classify(m)
+            self.cache[key] = c
+        return c
@@ -16,6 +16,14 @@
 # limitations under the License.
 
 import sys
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from .sweep import attribute
+from .markers import decode, MarkerClassifier
+from .rtree import IntervalIndex
+from .selfprofile import stage
 
 
 class Nsight(object):
@@ -26,53 +34,180 @@ class Nsight(object):
     #driverT = "CUPTI_ACTIVITY_KIND_DRIVER"
     runtimeT = "CUPTI_ACTIVITY_KIND_RUNTIME"
     kernelT = "CUPTI_ACTIVITY_KIND_KERNEL"
+    memcpyT = "CUPTI_ACTIVITY_KIND_MEMCPY"
+    memsetT = "CUPTI_ACTIVITY_KIND_MEMSET"
     markerT = "NVTX_EVENTS"
     stringT = "StringIds"
+    launchStart = "runtime.start"
+    launchPid = "runtime.globalTid / 0x1000000 % 0x1000000"
+    launchTid = "runtime.globalTid % 0x1000000"
+    #Columns of kernelSelect which identify the launching thread
+    threadColumns = ["objId"]
 
     def __init__(self, db):
         self.db = db
         self.markerId = 0
+        self.attribution = None
+        self.rtree = None
+        self.kernelFilters = []
+        self.markerWindow = None
+        self.markerThreads = None
+        self.nvtxWindows = False
+        self.memory = False
+        self.classifier = MarkerClassifier()
+        self.strings = None
+        self.seqMarkers = None
+        self.seqCursors = {}
+        self.pruned = {}
 
     def getProfileStart(self):
         """
 		Get the profile start time
 		"""
-        profStart = sys.maxsize
-        #for table in [self.driverT, self.runtimeT, self.kernelT, self.markerT]:
-        for table in [self.runtimeT, self.kernelT, self.markerT]:
-            colname = "start"
-            cmd = "select {} from {} ORDER BY {} ASC LIMIT 1".format(colname, table, colname)
-            result = self.db.select(cmd)
-            assert (len(result) <= 1)
-            if (len(result) == 1):
-                assert (colname in result[0])
-                t = result[0][colname]
-                if (t < profStart):
-                    profStart = t
-        assert (profStart < sys.maxsize)
+        #MIN() is answered from the index on start, if any, instead of sorting the table
+        cmd = "SELECT MIN(t) AS t FROM ({})".format(
+            " UNION ALL ".join("SELECT MIN(start) AS t FROM {}".format(table)
+                               for table in [self.runtimeT, self.kernelT, self.markerT])
+        )
+        profStart = self.db.select(cmd)[0]['t']
+        assert (profStart is not None)
         return profStart
 
     def createMarkerTable(self):
         """
 		Create a temporary table and index it to speed up repeated SQL quesries.
 		"""
-        cmd = 'CREATE TEMPORARY TABLE marker AS SELECT * FROM {}'.format(self.markerT)
+        cmd = 'CREATE TEMPORARY TABLE marker AS SELECT * FROM {} WHERE {}'.format(
+            self.markerT, self.markerTableFilter()
+        )
         self.db.execute(cmd)
 
         self.db.execute('CREATE INDEX start_index ON marker (start)')
         self.db.execute('CREATE INDEX end_index ON marker (end)')
         #self.db.execute('CREATE INDEX id_index ON marker (id)')
 
+    def createMarkerRTree(self):
+        """
+		Alternative to createMarkerTable. The temporary table is indexed with
+		an R*Tree on (thread, start, end) to find the enclosing markers of a
+		kernel with a single index lookup. Rows are never deleted.
+		"""
+        cmd = 'CREATE TEMPORARY TABLE marker AS SELECT * FROM {} WHERE end IS NOT NULL AND {}'.format(
+            self.markerT, self.markerTableFilter()
+        )
+        self.db.execute(cmd)
+        self.rtree = IntervalIndex(self.db, "marker", "globalTid", "start", "end")
+
+    def attributeMarkers(self, kInfo):
+        """
+		Attribute markers to all kernels (an iterable of kernel info) in a single pass.
+		This is an alternative to the temporary marker table. Once it is
+		done, getMarkerInfo looks up the enclosing markers in memory.
+		"""
+        launches = []
+        for info in kInfo:
+            self.encode_object_id(info)
+            launches.append((info['objId'], info['rStart'], info['rEnd']))
+        self.attributeLaunches(launches)
+
+    def attributeLaunches(self, launches):
+        """
+		attributeMarkers for an iterable of (objId, rStart, rEnd) launches.
+		"""
+        cmd = 'SELECT globalTid, start, end, text, textId FROM {} WHERE end IS NOT NULL AND {}'.format(
+            self.markerT, self.markerTableFilter()
+        )
+        result = self.db.select(cmd)
+        markers = ((r['globalTid'], r['start'], r['end'], r) for r in result)
+        self.attribution = attribute(launches, markers)
+
+    def loadSeqMarkers(self):
+        """
+		Load the start time, end time and text of the markers with seq id (inserted by PyTorch)
+		of every thread, in ascending order of start time, for seqMarkersBefore.
+		"""
+        cmd = 'SELECT globalTid, start, end, text, textId FROM {} WHERE end IS NOT NULL AND {} \
+				ORDER BY globalTid, start'.format(
+            self.markerT, self.markerTableFilter()
+        )
+        self.seqMarkers = {}
+        for r in self.db.iter_select(cmd):
+            m = r['text'] if r['text'] is not None else self.getString(r['textId'])
+            key = r['textId'] if r['textId'] is not None else m
+            if self.classifier.get(key, m)[0] == MarkerClassifier.SEQ:
+                starts, ends, texts = self.seqMarkers.setdefault(r['globalTid'], ([], [], []))
+                starts.append(r['start'])
+                ends.append(r['end'])
+                texts.append(m)
+
+    def seqMarkersBefore(self, objId, hiStart):
+        """
+		Get the markers with seq id of a thread which start after the innermost
+		marker of the previous fprop kernel of the thread and before hiStart,
+		the start of the innermost marker of the present kernel.
+		Every thread has a cursor into its markers which only moves forward,
+		so this is a bisection instead of a range query per kernel.
+		Markers which ended before an earlier kernel launch on the same
+		thread are skipped, like the pruned markers of NVVP.markersBetween.
+		"""
+        if self.seqMarkers is None:
+            self.loadSeqMarkers()
+        if objId not in self.seqMarkers:
+            return []
+        starts, ends, texts = self.seqMarkers[objId]
+        lo = self.seqCursors.get(objId, 0)
+        hi = max(lo, bisect_left(starts, hiStart, lo))
+        #The innermost marker of this kernel is excluded now and from the next lookup
+        self.seqCursors[objId] = max(lo, bisect_right(starts, hiStart, lo))
+        pruned = self.pruned.get(objId, -sys.maxsize)
+        return [texts[i] for i in range(lo, hi) if ends[i] >= pruned]
+
+    def getString(self, id_):
+        """
+		Get the string associated with an id. The string table is loaded on first use.
+		"""
+        if self.strings is None:
+            cmd = "SELECT id, value FROM {}".format(self.stringT)
+            self.strings = {r['id']: r['value'] for r in self.db.select(cmd)}
+        return self.strings[id_]
+
+    def getRanges(self, pattern):
+        """
+		Get the (start, end, text) of every NVTX range whose text matches the compiled regex pattern.
+		The text is either stored inline or in the string table (textId).
+		"""
+        cmd = 'SELECT start, end, text, textId FROM {} WHERE end IS NOT NULL AND \
+				(text IS NOT NULL OR textId IS NOT NULL)'.format(self.markerT)
+        ranges = []
+        for r in self.db.iter_select(cmd):
+            text = r['text'] if r['text'] is not None else self.getString(r['textId'])
+            if pattern.search(text):
+                ranges.append((r['start'], r['end'], text))
+        return ranges
+
     def encode_object_id(self, info):
         # Nothing to do for nsight. objId comes out of database
         assert 'objId' in info
 
-    def getKernelInfo(self):
+    @staticmethod
+    def decodeThreads(columns):
         """
-		Get GPU kernel info
+		Decode the pid and tid from the globalTid (objId) column of a KernelTable.
+		Returns the pid, tid and object id arrays.
+		"""
+        objId = columns['objId']
+        return objId // 0x1000000 % 0x1000000, objId % 0x1000000, objId
+
+    def kernelSelect(self, ordered=True, filtered=True):
+        """
+		SQL query which joins every GPU kernel with its runtime / driver launch.
+		If memory is set, memcpy and memset activities are included as well,
+		sorted with the kernels by GPU start time unless ordered is False.
+		The kernel filters are applied unless filtered is False.
 		"""
         cmd = (
             "SELECT "
+            "'kernel' AS type, "
             "demangledName as kNameId, "
             "strings.value as name, "
             "runtime.start as rStart, "
@@ -82,14 +217,153 @@ class Nsight(object):
             "runtime.globalTid % 0x1000000 AS tid, "
             "kernels.globalPid / 0x1000000 % 0x1000000 AS kpid, "
             "kernels.correlationId,kernels.start,kernels.end,deviceId,streamId,"
-            "gridX,gridY,gridZ,blockX,blockY,blockZ "
+            "gridX,gridY,gridZ,blockX,blockY,blockZ,"
+            "NULL AS bytes, NULL AS copyKind, NULL AS srcKind, NULL AS dstKind "
             "FROM {} AS kernels "
             "JOIN {} AS strings ON (kNameId = strings.Id) "
             "JOIN {} AS runtime ON (kernels.correlationId = runtime.correlationId AND kpid = pid) "
         ).format(self.kernelT, self.stringT, self.runtimeT)
-        result = self.db.select(cmd)
+        if filtered and len(self.kernelFilters):
+            cmd += "WHERE " + " AND ".join(self.kernelFilters)
+
+        if self.memory:
+            selects = [cmd]
+            if self.db.hasTable(self.memcpyT):
+                selects.append(self.memorySelect("memcpy", self.memcpyT, "copyKind", "srcKind", "dstKind", filtered))
+            if self.db.hasTable(self.memsetT):
+                selects.append(self.memorySelect("memset", self.memsetT, "NULL", "memKind", "NULL", filtered))
+            cmd = " UNION ALL ".join(selects)
+            if ordered:
+                cmd = "SELECT * FROM ({}) ORDER BY start".format(cmd)
+        return cmd
+
+    def memorySelect(self, type_, table, copyKind, srcKind, dstKind, filtered=True):
+        """
+		SQL query which joins a memcpy / memset activity with its runtime launch.
+		The columns match kernelSelect. The activity table is aliased to kernels
+		so that the kernel filters apply unchanged.
+		"""
+        cmd = (
+            "SELECT "
+            "'{}' AS type, "
+            "NULL as kNameId, "
+            "NULL as name, "
+            "runtime.start as rStart, "
+            "runtime.end as rEnd, "
+            "runtime.globalTid as objId, "
+            "runtime.globalTid / 0x1000000 % 0x1000000 AS pid, "
+            "runtime.globalTid % 0x1000000 AS tid, "
+            "kernels.globalPid / 0x1000000 % 0x1000000 AS kpid, "
+            "kernels.correlationId,kernels.start,kernels.end,deviceId,streamId,"
+            "NULL,NULL,NULL,NULL,NULL,NULL,"
+            "kernels.bytes AS bytes, {} AS copyKind, {} AS srcKind, {} AS dstKind "
+            "FROM {} AS kernels "
+            "JOIN {} AS runtime ON (kernels.correlationId = runtime.correlationId AND kpid = pid) "
+        ).format(type_, copyKind, srcKind, dstKind, table, self.runtimeT)
+        if filtered and len(self.kernelFilters):
+            cmd += "WHERE " + " AND ".join(self.kernelFilters)
+        return cmd
+
+    def restrictMarkers(self):
+        """
+		Only keep the markers of the threads which launched a selected kernel
+		and which overlap the launch of a selected kernel.
+		Call this once the kernel filters are set.
+		"""
+        cmd = "SELECT MIN(rStart) AS lo, MAX(rEnd) AS hi FROM ({})".format(self.kernelSelect())
+        result = self.db.select(cmd)[0]
+        if result['lo'] is not None:
+            self.markerWindow = (result['lo'], result['hi'])
+        #Markers are only attributed to kernels launched by the same thread
+        cmd = "SELECT DISTINCT objId FROM ({})".format(self.kernelSelect())
+        self.markerThreads = ["{:d}".format(r['objId']) for r in self.db.select(cmd)]
+
+    def markerTableFilter(self):
+        """
+		markerFilter on the columns of the marker table.
+		"""
+        return self.markerFilter(self.markerT + ".start", self.markerT + ".end", self.markerT + ".globalTid")
+
+    def markerFilter(self, start, end, thread):
+        """
+		SQL condition on the start, end and thread columns of a marker for restrictMarkers
+		and the windows of --within-range / sampling.
+		"""
+        cond = "1"
+        if self.markerWindow is not None:
+            lo, hi = self.markerWindow
+            cond = "{} < {:d} AND {} > {:d}".format(start, hi, end, lo)
+        if self.markerThreads is not None:
+            cond += " AND {} IN ({})".format(thread, ", ".join(self.markerThreads))
+        if self.nvtxWindows:
+            #The marker overlaps one of the (disjoint) windows of --within-range / sampling
+            cond += (
+                " AND (SELECT w.end FROM nvtxWindow AS w WHERE w.start <= {} ORDER BY w.start DESC LIMIT 1) >= {}"
+            ).format(end, start)
+        return cond
+
+    def getKernelInfo(self):
+        """
+		Get GPU kernel info
+		"""
+        result = self.db.select(self.kernelSelect())
         return result
 
+    def iterKernelInfo(self):
+        """
+		Get GPU kernel info, one kernel at a time.
+		"""
+        return self.db.iter_select(self.kernelSelect())
+
+    def getKernelCount(self):
+        """
+		Get the number of GPU kernels without fetching them.
+		"""
+        cmd = "SELECT COUNT(*) AS count FROM ({})".format(self.kernelSelect())
+        result = self.db.select(cmd)
+        return result[0]['count']
+
+    def launchTimes(self, column):
+        """
+		Get the device and the launch start (column rStart) or the GPU start
+		(column start) of every kernel as NumPy arrays, sorted by device and time.
+		The kernel filters are not applied, the launch queue holds all kernels.
+		"""
+        cmd = "SELECT deviceId, {0} FROM ({1}) ORDER BY deviceId, {0}".format(
+            column, self.kernelSelect(ordered=False, filtered=False)
+        )
+        t = self.db.select_array(cmd, [('deviceId', np.int64), ('time', np.int64)])
+        return t['deviceId'], t['time']
+
+    def retire(self, objId, sTime):
+        """
+		Markers of a thread which ended before sTime are no longer required.
+		Delete them from the temporary SQL table to speed up future queries,
+		or skip them in seqMarkersBefore when the markers are in memory.
+		"""
+        self.pruned[objId] = max(self.pruned.get(objId, -sys.maxsize), sTime)
+        if (self.attribution is None) and (self.rtree is None):
+            margin = 0
+            cmd = 'DELETE FROM marker WHERE globalTid = ? AND end < ?'
+            #cmd = 'DELETE FROM marker WHERE end < ?'
+            with stage("marker query"):
+                self.db.execute(cmd, (objId, sTime - margin))
+
+    def getCursor(self):
+        """
+		The state of the marker attribution which depends on the kernels seen so far,
+		for checkpoints. Only contains JSON types.
+		"""
+        return {'seqCursors': sorted(self.seqCursors.items()), 'pruned': sorted(self.pruned.items())}
+
+    def setCursor(self, cursor):
+        """
+		Restore the state saved by getCursor once the markers are set up.
+		"""
+        self.seqCursors = {objId: i for objId, i in cursor['seqCursors']}
+        for objId, sTime in cursor['pruned']:
+            self.retire(objId, sTime)
+
     def getMarkerInfo(self, objId, startTime, endTime):
         """
 		This function first finds all NVTX markers encapsulating
@@ -118,28 +392,6 @@ class Nsight(object):
 
         #Helper functions
 
-        def delete(objId, sTime):
-            """
-			Delete rows from the temporary SQL table which are no longer required.
-			This speeds up future queries.
-			"""
-            margin = 0
-            cmd = 'DELETE FROM marker WHERE globalTid = {} AND end < {}'.format(objId, sTime - margin)
-            #cmd = 'DELETE FROM marker WHERE end < {}'.format(sTime - margin)
-            self.db.execute(cmd)
-
-        def getLayerName(mlist):
-            """
-			Get layer names from layer marker list.
-			"""
-            layers = []
-            assert (type(mlist) == list)
-            for m in mlist:
-                assert ("layer:" in m)
-                l = m.split(":")[1]
-                layers.append(l)
-            return layers
-
         def getSeqId(mlist):
             """
 			Get sequence ids from seq / alt seq marker list.
@@ -193,7 +445,7 @@ class Nsight(object):
             if len(mlist) == 0:
                 return mlist
             mlist = mlist[-1]  #The last stack trace will be a super set.
-            mlist = eval(mlist)
+            mlist = decode(mlist)
             mlist = mlist['traceMarker']
             assert (type(mlist) == list)
             mlist = list(filter(lambda x: "/torch/nn/modules/" not in x, mlist))
@@ -208,35 +460,46 @@ class Nsight(object):
             return mlist
 
         #Find all encapsulating markers
-        cmd = 'SELECT text from marker where \
-				globalTid = {} and \
-				start < {} and \
-				end > {} \
-				ORDER BY start ASC'.format(objId, startTime, endTime)
-        result = self.db.select(cmd)
+        with stage("marker query"):
+            if self.rtree is not None:
+                result = self.rtree.enclosing("text,textId,start", objId, startTime, endTime)
+            elif self.attribution is None:
+                cmd = 'SELECT text, textId, start from marker where \
+					globalTid = ? and \
+					start < ? and \
+					end > ? \
+					ORDER BY start ASC'
+                result = self.db.select(cmd, (objId, startTime, endTime))
+            else:
+                result = self.attribution.get((objId, startTime, endTime), ())
 
-        #Bin markers into different lists
+        #Bin markers into different lists, every distinct string is classified once
+        layers = []
+        seqIds = set()
         for r in result:
-            #m = self.getString(r['name'])
-            m = r['text']
+            #Recent versions of Nsight store the text in the string table
+            m = r['text'] if r['text'] is not None else self.getString(r['textId'])
+            key = r['textId'] if r['textId'] is not None else m
+            category, backward, value = self.classifier.get(key, m)
 
-            #Hack: If its a known gradient checkpointing marker, ignore it.
-            if m.find("CheckpointFunctionBackward") >= 0:
+            if category == MarkerClassifier.IGNORE:
                 continue
 
-            if ("_backward, seq =" in m) or ("Backward, seq =" in m) or ("Backward0, seq =" in m):
+            if backward:
                 bprop = True
 
-            if ("mod" in m) and ("op" in m) and ("args" in m) and ("type" in m):
+            if category == MarkerClassifier.PYPROF:
                 pyprofMarkers.append(m)
-            elif ("layer:" in m):
+            elif category == MarkerClassifier.LAYER:
                 layerMarkers.append(m)
-            elif ("traceMarker" in m):
+                layers.append(value)
+            elif category == MarkerClassifier.TRACE:
                 traceMarkers.append(m)
-            elif ("strRepr" in m):
+            elif category == MarkerClassifier.REPR:
                 reprMarkers.append(m)
-            elif (", seq = " in m):
+            elif category == MarkerClassifier.SEQ:
                 seqMarkers.append(m)
+                seqIds.add(value)
             else:
                 otherMarkers.append(m)
 
@@ -252,34 +515,19 @@ class Nsight(object):
         #Get markers with seq id (inserted by PyTorch) from the previous kernel to the present kernel
         #Only for fprop kernels
         if (len(result) and not bprop):
-            '''
-			loId = self.markerId
-			hiId = result[-1]['id']
-			self.markerId = hiId
-			
-			#Get markers between loId and hiId
-			cmd = 'SELECT id,name from marker where objectId = "{}" and id > {} and id < {} ORDER BY startTime ASC'.format(objId, loId, hiId)
-			result1 = self.db.select(cmd)
-
-			for r in result1:
-				m = self.getString(r['name'])
-				#Get only markers with seq id
-				if (", seq=" in m):
-					altSeqMarkers.append(m)
-
-			#Remove duplicates, sort and prune altSeqMarkers
-			if (len(altSeqMarkers)):
-				altSeqMarkers = list(set(altSeqMarkers))
-				altSeqMarkers.sort(key=seqcompare)
-				altSeqMarkers = prune(altSeqMarkers)
-			'''
-            pass
-
-        delete(objId, startTime)
-        #delete("", startTime)
+            with stage("marker query"):
+                altSeqMarkers = self.seqMarkersBefore(objId, result[-1]['start'])
+
+            #Remove duplicates, sort and prune altSeqMarkers
+            if (len(altSeqMarkers)):
+                altSeqMarkers = list(set(altSeqMarkers))
+                altSeqMarkers.sort(key=seqcompare)
+                altSeqMarkers = prune(altSeqMarkers)
+
+        self.retire(objId, startTime)
 
         return layerMarkers, filterTrace(
             traceMarkers
-        ), reprMarkers, pyprofMarkers, seqMarkers, otherMarkers, altSeqMarkers, getSeqId(seqMarkers), getSeqId(
+        ), reprMarkers, pyprofMarkers, seqMarkers, otherMarkers, altSeqMarkers, sorted(seqIds), getSeqId(
             altSeqMarkers
-        ), getLayerName(layerMarkers)
+        ), layers
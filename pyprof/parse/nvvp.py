@@ -17,6 +17,64 @@
 
 import sys
 import struct, binascii
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from .sweep import attribute
+from .rtree import IntervalIndex
+from .selfprofile import stage
+from .markers import decode, MarkerClassifier
+
+#Helper functions
+
+
+def getSeqId(mlist):
+    """
+	Get sequence ids from seq / alt seq marker list.
+	"""
+    ids = []
+    assert (type(mlist) == list)
+    for m in mlist:
+        assert (", seq = " in m)
+        seq = int(m.split("=")[1])
+        ids.append(seq)
+
+    #Remove duplicates
+    ids = list(set(ids))
+    ids.sort()
+    return ids
+
+
+def seqcompare(elem):
+    """
+	Sorting function for sequence markers
+	"""
+    assert (", seq = " in elem)
+    #sort by sequence id and then the string
+    l = elem.split(" = ")
+    return l[1] + l[0]
+
+
+def prune(mlist):
+    """
+	Remove markers with the same seqId and if the strings are similar.
+	This function works on a sorted sequence.
+	"""
+    assert (type(mlist) == list)
+    assert (len(mlist))
+    a = mlist[0:1]
+    for i in range(1, len(mlist)):
+        m = mlist[i]
+        pm = mlist[i - 1]
+        name, seq = m.split(",")
+        pname, pseq = pm.split(",")
+        similar = (name in pname) or (pname in name)
+        if (seq == pseq) and similar:
+            continue
+        else:
+            a.append(m)
+    return a
 
 
 class NVVP(object):
@@ -27,46 +85,73 @@ class NVVP(object):
     driverT = "CUPTI_ACTIVITY_KIND_DRIVER"
     runtimeT = "CUPTI_ACTIVITY_KIND_RUNTIME"
     kernelT = "CUPTI_ACTIVITY_KIND_CONCURRENT_KERNEL"
+    memcpyT = "CUPTI_ACTIVITY_KIND_MEMCPY"
+    memsetT = "CUPTI_ACTIVITY_KIND_MEMSET"
     markerT = "CUPTI_ACTIVITY_KIND_MARKER"
     stringT = "StringTable"
+    launchStart = "coalesce(runtime.start, driver.start)"
+    launchPid = "coalesce(runtime.processId, driver.processId)"
+    launchTid = "coalesce(runtime.threadId, driver.threadId) & 0xFFFFFFFF"
+    #Columns of kernelSelect which identify the launching thread
+    threadColumns = ["pid", "tid"]
 
     def __init__(self, db):
         self.db = db
         self.markerId = 0
+        self.attribution = None
+        self.rtree = None
+        self.kernelFilters = []
+        self.markerWindow = None
+        self.markerThreads = None
+        self.nvtxWindows = False
+        self.memory = False
+        self.classifier = MarkerClassifier()
+        self.markerIds = {}
+        self.pruned = {}
+        self.indexed = False
+        self.deferAltSeq = False
+        self.altSeqRequest = None
+        self.strings = self.loadStrings()
+        self.stringLookups = 0
 
     def getProfileStart(self):
         """
 		Get the profile start time
 		"""
-        profStart = sys.maxsize
-        for table in [self.driverT, self.runtimeT, self.kernelT, self.markerT]:
-            colname = "timestamp" if table is self.markerT else "start"
-            cmd = "select {} from {} ORDER BY {} ASC LIMIT 1".format(colname, table, colname)
-            result = self.db.select(cmd)
-            assert (len(result) <= 1)
-            if (len(result) == 1):
-                assert (colname in result[0])
-                t = result[0][colname]
-                if (t < profStart):
-                    profStart = t
-        assert (profStart < sys.maxsize)
+        #MIN() is answered from the index on start, if any, instead of sorting the table
+        cmd = "SELECT MIN(t) AS t FROM ({})".format(
+            " UNION ALL ".join(
+                "SELECT MIN({}) AS t FROM {}".format("timestamp" if table is self.markerT else "start", table)
+                for table in [self.driverT, self.runtimeT, self.kernelT, self.markerT]
+            )
+        )
+        profStart = self.db.select(cmd)[0]['t']
+        assert (profStart is not None)
         return profStart
 
+    def loadStrings(self):
+        """
+		Load the string table into memory.
+		Every marker of every kernel refers to it, so it is read once
+		instead of running one query per marker.
+		"""
+        cmd = "select _id_, value from {}".format(self.stringT)
+        return {r['_id_']: r['value'] for r in self.db.select(cmd)}
+
     def getString(self, id_):
         """
 		Get the string associated with an id.
 		"""
-        cmd = "select value from {} where _id_ = {}".format(self.stringT, id_)
-        result = self.db.select(cmd)
-        assert (len(result) == 1)
-        return result[0]['value']
+        assert (id_ in self.strings)
+        self.stringLookups += 1
+        return self.strings[id_]
 
-    def createMarkerTable(self):
+    def markerSelect(self):
         """
-		Create a temporary table and index it to speed up repeated SQL quesries.
-		The table is an INNER JOIN of CUPTI_ACTIVITY_KIND_MARKER with itself.
+		SQL query which pairs the start (flags = 2) and end (flags = 4)
+		records of CUPTI_ACTIVITY_KIND_MARKER into ranges.
 		"""
-        cmd = 'CREATE TEMPORARY TABLE marker AS SELECT \
+        cmd = 'SELECT \
 					a._id_ as id, \
 					a.timestamp AS startTime, \
 					b.timestamp AS endTime, \
@@ -74,13 +159,95 @@ class NVVP(object):
 					a.name AS name \
 					FROM {} AS a INNER JOIN {} AS b ON \
 					a.id = b.id and \
-					a.flags = 2 and b.flags = 4'.format(self.markerT, self.markerT)
+					a.flags = 2 and b.flags = 4 and {}'.format(
+            self.markerT, self.markerT,
+            self.markerFilter("a.timestamp", "b.timestamp", "HEX(a.objectId)")
+        )
+        return cmd
+
+    def createMarkerTable(self):
+        """
+		Create a temporary table and index it to speed up repeated SQL quesries.
+		The table is an INNER JOIN of CUPTI_ACTIVITY_KIND_MARKER with itself.
+		"""
+        cmd = 'CREATE TEMPORARY TABLE marker AS ' + self.markerSelect()
         self.db.execute(cmd)
 
         self.db.execute('CREATE INDEX start_index ON marker (startTime)')
         self.db.execute('CREATE INDEX end_index ON marker (endTime)')
         self.db.execute('CREATE INDEX id_index ON marker (id)')
 
+    def createMarkerRTree(self):
+        """
+		Alternative to createMarkerTable. The temporary table is indexed with
+		an R*Tree on (thread, start, end) to find the enclosing markers of a
+		kernel with a single index lookup. Rows are never deleted, the markers
+		are indexed in memory for the alternate seq id lookup instead.
+		"""
+        cmd = 'CREATE TEMPORARY TABLE marker AS ' + self.markerSelect()
+        self.db.execute(cmd)
+        self.rtree = IntervalIndex(self.db, "marker", "objectId", "startTime", "endTime")
+        self.indexMarkers(self.db.select('SELECT * FROM marker'))
+
+    def attributeMarkers(self, kInfo):
+        """
+		Attribute markers to all kernels (an iterable of kernel info) in a single pass.
+		This is an alternative to the temporary marker table. Once it is
+		done, getMarkerInfo looks up the enclosing markers in memory.
+		"""
+        launches = []
+        for info in kInfo:
+            self.encode_object_id(info)
+            launches.append((info['objId'], info['rStart'], info['rEnd']))
+        self.attributeLaunches(launches)
+
+    def attributeLaunches(self, launches):
+        """
+		attributeMarkers for an iterable of (objId, rStart, rEnd) launches.
+		"""
+        result = self.db.select(self.markerSelect())
+        markers = ((r['objectId'], r['startTime'], r['endTime'], r) for r in result)
+        self.attribution = attribute(launches, markers)
+        self.indexMarkers(result)
+
+    def indexMarkers(self, result=None):
+        """
+		Index the markers of every thread by id for the alternate seq id lookup.
+		"""
+        if result is None:
+            result = self.db.select(self.markerSelect())
+        result.sort(key=lambda r: (r['objectId'], r['id']))
+        for r in result:
+            ids, rows = self.markerIds.setdefault(r['objectId'], ([], []))
+            ids.append(r['id'])
+            rows.append(r)
+        self.indexed = True
+
+    def markersBetween(self, objId, loId, hiId):
+        """
+		In memory equivalent of selecting the markers of a thread with
+		loId < id < hiId from the temporary marker table.
+		Markers which ended before an earlier kernel launch on the same
+		thread would have been deleted from the table and are skipped.
+		"""
+        if objId not in self.markerIds:
+            return []
+        ids, rows = self.markerIds[objId]
+        lo = bisect_right(ids, loId)
+        hi = bisect_left(ids, hiId)
+        pruned = self.pruned.get(objId, -sys.maxsize)
+        return [r for r in rows[lo:hi] if r['endTime'] >= pruned]
+
+    def getRanges(self, pattern):
+        """
+		Get the (start, end, text) of every NVTX range whose text matches the compiled regex pattern.
+		"""
+        ids = [id_ for id_, value in self.strings.items() if pattern.search(value)]
+        if len(ids) == 0:
+            return []
+        cmd = self.markerSelect() + ' and a.name IN ({})'.format(",".join(str(id_) for id_ in ids))
+        return [(r['startTime'], r['endTime'], self.strings[r['name']]) for r in self.db.select(cmd)]
+
     def encode_object_id(self, info):
         """
         Encode the object ID from the pid and tid values, and put into dict
@@ -89,12 +256,32 @@ class NVVP(object):
         objId = binascii.hexlify(objId).decode('ascii').upper()
         info['objId'] = objId
 
-    def getKernelInfo(self):
+    @staticmethod
+    def decodeThreads(columns):
         """
-		Get GPU kernel info
+		encode_object_id for the pid and tid columns of a KernelTable.
+		Returns the pid, tid and object id arrays.
+		"""
+        pid = columns['pid']
+        tid = columns['tid']
+        #The 12 bytes of struct.pack('<i', pid) + struct.pack('<q', tid), converted to hex with a lookup table
+        packed = np.empty(len(pid), dtype=[('pid', "<i4"), ('tid', "<i8")])
+        packed['pid'] = pid
+        packed['tid'] = tid
+        digits = np.array(["{:02X}".format(i) for i in range(256)], dtype="S2")
+        objId = digits[packed.view(np.uint8).reshape(-1, 12)].view("S24").ravel().astype(str)
+        return pid, tid, objId
+
+    def kernelSelect(self, ordered=True, filtered=True):
+        """
+		SQL query which joins every GPU kernel with its runtime / driver launch.
+		If memory is set, memcpy and memset activities are included as well,
+		sorted with the kernels by GPU start time unless ordered is False.
+		The kernel filters are applied unless filtered is False.
 		"""
         cmd = (
             "SELECT "
+            "'kernel' AS type, "
             "name AS kNameId, "
             "strings.value as name, "
             "coalesce(runtime.start, driver.start) as rStart, "
@@ -102,15 +289,181 @@ class NVVP(object):
             "coalesce(runtime.processId, driver.processId) as pid, "
             "coalesce(runtime.threadId, driver.threadId) & 0xFFFFFFFF as tid, "
             "kernels.correlationId,kernels.start,kernels.end,deviceId,streamId,"
-            "gridX,gridY,gridZ,blockX,blockY,blockZ "
+            "gridX,gridY,gridZ,blockX,blockY,blockZ,"
+            "NULL AS bytes, NULL AS copyKind, NULL AS srcKind, NULL AS dstKind "
             "FROM {} AS kernels "
             "JOIN {} AS strings ON (KNameId = strings._id_) "
             "LEFT JOIN {} AS runtime ON (kernels.correlationId = runtime.correlationId) "
             "LEFT JOIN {} AS driver ON (kernels.correlationId = driver.correlationId) "
         ).format(self.kernelT, self.stringT, self.runtimeT, self.driverT)
-        result = self.db.select(cmd)
+        if filtered and len(self.kernelFilters):
+            cmd += "WHERE " + " AND ".join(self.kernelFilters)
+
+        if self.memory:
+            selects = [cmd]
+            if self.db.hasTable(self.memcpyT):
+                selects.append(self.memorySelect("memcpy", self.memcpyT, "copyKind", "srcKind", "dstKind", filtered))
+            if self.db.hasTable(self.memsetT):
+                selects.append(self.memorySelect("memset", self.memsetT, "NULL", "memoryKind", "NULL", filtered))
+            cmd = " UNION ALL ".join(selects)
+            if ordered:
+                cmd = "SELECT * FROM ({}) ORDER BY start".format(cmd)
+        return cmd
+
+    def memorySelect(self, type_, table, copyKind, srcKind, dstKind, filtered=True):
+        """
+		SQL query which joins a memcpy / memset activity with its runtime / driver launch.
+		The columns match kernelSelect. The activity table is aliased to kernels
+		so that the kernel filters apply unchanged.
+		"""
+        cmd = (
+            "SELECT "
+            "'{}' AS type, "
+            "NULL AS kNameId, "
+            "NULL as name, "
+            "coalesce(runtime.start, driver.start) as rStart, "
+            "coalesce(runtime.end, driver.end) as rEnd, "
+            "coalesce(runtime.processId, driver.processId) as pid, "
+            "coalesce(runtime.threadId, driver.threadId) & 0xFFFFFFFF as tid, "
+            "kernels.correlationId,kernels.start,kernels.end,deviceId,streamId,"
+            "NULL,NULL,NULL,NULL,NULL,NULL,"
+            "kernels.bytes AS bytes, {} AS copyKind, {} AS srcKind, {} AS dstKind "
+            "FROM {} AS kernels "
+            "LEFT JOIN {} AS runtime ON (kernels.correlationId = runtime.correlationId) "
+            "LEFT JOIN {} AS driver ON (kernels.correlationId = driver.correlationId) "
+        ).format(type_, copyKind, srcKind, dstKind, table, self.runtimeT, self.driverT)
+        if filtered and len(self.kernelFilters):
+            cmd += "WHERE " + " AND ".join(self.kernelFilters)
+        return cmd
+
+    def restrictMarkers(self):
+        """
+		Only keep the markers of the threads which launched a selected kernel
+		and which overlap the launch of a selected kernel.
+		Call this once the kernel filters are set.
+		"""
+        cmd = "SELECT MIN(rStart) AS lo, MAX(rEnd) AS hi FROM ({})".format(self.kernelSelect())
+        result = self.db.select(cmd)[0]
+        if result['lo'] is not None:
+            self.markerWindow = (result['lo'], result['hi'])
+        #Markers are only attributed to kernels launched by the same thread
+        threads = []
+        for r in self.db.select("SELECT DISTINCT pid, tid FROM ({})".format(self.kernelSelect())):
+            self.encode_object_id(r)
+            threads.append("'{}'".format(r['objId']))
+        self.markerThreads = threads
+
+    def markerFilter(self, start, end, thread):
+        """
+		SQL condition on the start, end and thread columns of a marker for restrictMarkers
+		and the windows of --within-range / sampling.
+		"""
+        cond = "1"
+        if self.markerWindow is not None:
+            lo, hi = self.markerWindow
+            cond = "{} < {:d} AND {} > {:d}".format(start, hi, end, lo)
+        if self.markerThreads is not None:
+            cond += " AND {} IN ({})".format(thread, ", ".join(self.markerThreads))
+        if self.nvtxWindows:
+            #The marker overlaps one of the (disjoint) windows of --within-range / sampling
+            cond += (
+                " AND (SELECT w.end FROM nvtxWindow AS w WHERE w.start <= {} ORDER BY w.start DESC LIMIT 1) >= {}"
+            ).format(end, start)
+        return cond
+
+    def getKernelInfo(self):
+        """
+		Get GPU kernel info
+		"""
+        result = self.db.select(self.kernelSelect())
         return result
 
+    def iterKernelInfo(self):
+        """
+		Get GPU kernel info, one kernel at a time.
+		"""
+        return self.db.iter_select(self.kernelSelect())
+
+    def getKernelCount(self):
+        """
+		Get the number of GPU kernels without fetching them.
+		"""
+        cmd = "SELECT COUNT(*) AS count FROM ({})".format(self.kernelSelect())
+        result = self.db.select(cmd)
+        return result[0]['count']
+
+    def launchTimes(self, column):
+        """
+		Get the device and the launch start (column rStart) or the GPU start
+		(column start) of every kernel as NumPy arrays, sorted by device and time.
+		The kernel filters are not applied, the launch queue holds all kernels.
+		"""
+        cmd = "SELECT deviceId, {0} FROM ({1}) ORDER BY deviceId, {0}".format(
+            column, self.kernelSelect(ordered=False, filtered=False)
+        )
+        t = self.db.select_array(cmd, [('deviceId', np.int64), ('time', np.int64)])
+        return t['deviceId'], t['time']
+
+    def getAltSeqMarkers(self, objId, hiId):
+        """
+		Get the markers with seq id (inserted by PyTorch) of a thread
+		between the previous kernel and the marker with id hiId.
+		"""
+        altSeqMarkers = []
+        loId = self.markerId
+        self.markerId = hiId
+
+        #Get markers between loId and hiId
+        with stage("marker query"):
+            if self.indexed:
+                result = self.markersBetween(objId, loId, hiId)
+            else:
+                cmd = 'SELECT id,name from marker where objectId = ? and id > ? and id < ? ORDER BY startTime ASC'
+                result = self.db.select(cmd, (objId, loId, hiId))
+
+        for r in result:
+            m = self.getString(r['name'])
+            #Get only markers with seq id
+            if (", seq = " in m):
+                altSeqMarkers.append(m)
+
+        #Remove duplicates, sort and prune altSeqMarkers
+        if (len(altSeqMarkers)):
+            altSeqMarkers = list(set(altSeqMarkers))
+            altSeqMarkers.sort(key=seqcompare)
+            altSeqMarkers = prune(altSeqMarkers)
+
+        return altSeqMarkers
+
+    def retire(self, objId, sTime):
+        """
+		Markers of a thread which ended before sTime are no longer required.
+		Delete them from the temporary SQL table to speed up future queries,
+		or skip them in markersBetween when the markers are in memory.
+		"""
+        self.pruned[objId] = max(self.pruned.get(objId, -sys.maxsize), sTime)
+        if not self.indexed:
+            margin = 0
+            cmd = 'DELETE FROM marker WHERE objectId = ? AND endTime < ?'
+            #cmd = 'DELETE FROM marker WHERE endTime < ?'
+            with stage("marker query"):
+                self.db.execute(cmd, (objId, sTime - margin))
+
+    def getCursor(self):
+        """
+		The state of the marker attribution which depends on the kernels seen so far,
+		for checkpoints. Only contains JSON types.
+		"""
+        return {'markerId': self.markerId, 'pruned': sorted(self.pruned.items())}
+
+    def setCursor(self, cursor):
+        """
+		Restore the state saved by getCursor once the markers are set up.
+		"""
+        self.markerId = cursor['markerId']
+        for objId, sTime in cursor['pruned']:
+            self.retire(objId, sTime)
+
     def getMarkerInfo(self, objId, startTime, endTime):
         """
 		This function first finds all NVTX markers encapsulating
@@ -139,73 +492,6 @@ class NVVP(object):
 
         #Helper functions
 
-        def delete(objId, sTime):
-            """
-			Delete rows from the temporary SQL table which are no longer required.
-			This speeds up future queries.
-			"""
-            margin = 0
-            cmd = 'DELETE FROM marker WHERE objectId = "{}" AND endTime < {}'.format(objId, sTime - margin)
-            #cmd = 'DELETE FROM marker WHERE endTime < {}'.format(sTime - margin)
-            self.db.execute(cmd)
-
-        def getLayerName(mlist):
-            """
-			Get layer names from layer marker list.
-			"""
-            layers = []
-            assert (type(mlist) == list)
-            for m in mlist:
-                assert ("layer:" in m)
-                l = m.split(":")[1]
-                layers.append(l)
-            return layers
-
-        def getSeqId(mlist):
-            """
-			Get sequence ids from seq / alt seq marker list.
-			"""
-            ids = []
-            assert (type(mlist) == list)
-            for m in mlist:
-                assert (", seq = " in m)
-                seq = int(m.split("=")[1])
-                ids.append(seq)
-
-            #Remove duplicates
-            ids = list(set(ids))
-            ids.sort()
-            return ids
-
-        def seqcompare(elem):
-            """
-			Sorting function for sequence markers
-			"""
-            assert (", seq = " in elem)
-            #sort by sequence id and then the string
-            l = elem.split(" = ")
-            return l[1] + l[0]
-
-        def prune(mlist):
-            """
-			Remove markers with the same seqId and if the strings are similar.
-			This function works on a sorted sequence.
-			"""
-            assert (type(mlist) == list)
-            assert (len(mlist))
-            a = mlist[0:1]
-            for i in range(1, len(mlist)):
-                m = mlist[i]
-                pm = mlist[i - 1]
-                name, seq = m.split(",")
-                pname, pseq = pm.split(",")
-                similar = (name in pname) or (pname in name)
-                if (seq == pseq) and similar:
-                    continue
-                else:
-                    a.append(m)
-            return a
-
         def filterTrace(mlist):
             """
 			Filter trace markers to remove certain file names.
@@ -214,7 +500,7 @@ class NVVP(object):
             if len(mlist) == 0:
                 return mlist
             mlist = mlist[-1]  #The last stack trace will be a super set.
-            mlist = eval(mlist)
+            mlist = decode(mlist)
             mlist = mlist['traceMarker']
             assert (type(mlist) == list)
             mlist = list(filter(lambda x: "/torch/nn/modules/" not in x, mlist))
@@ -229,34 +515,45 @@ class NVVP(object):
             return mlist
 
         #Find all encapsulating markers
-        cmd = 'SELECT id,name from marker where \
-				objectId = "{}" and \
-				startTime < {} and \
-				endTime > {} \
-				ORDER BY startTime ASC'.format(objId, startTime, endTime)
-        result = self.db.select(cmd)
+        with stage("marker query"):
+            if self.rtree is not None:
+                result = self.rtree.enclosing("id,name", objId, startTime, endTime)
+            elif self.attribution is None:
+                cmd = 'SELECT id,name from marker where \
+					objectId = ? and \
+					startTime < ? and \
+					endTime > ? \
+					ORDER BY startTime ASC'
+                result = self.db.select(cmd, (objId, startTime, endTime))
+            else:
+                result = self.attribution.get((objId, startTime, endTime), ())
 
-        #Bin markers into different lists
+        #Bin markers into different lists, every distinct string is classified once
+        layers = []
+        seqIds = set()
         for r in result:
-            m = self.getString(r['name'])
+            key = r['name']
+            m = self.getString(key)
+            category, backward, value = self.classifier.get(key, m)
 
-            #Hack: If its a known gradient checkpointing marker, ignore it.
-            if m.find("CheckpointFunctionBackward") >= 0:
+            if category == MarkerClassifier.IGNORE:
                 continue
 
-            if ("_backward, seq =" in m) or ("Backward, seq =" in m) or ("Backward0, seq =" in m):
+            if backward:
                 bprop = True
 
-            if ("mod" in m) and ("op" in m) and ("args" in m) and ("type" in m):
+            if category == MarkerClassifier.PYPROF:
                 pyprofMarkers.append(m)
-            elif ("layer:" in m):
+            elif category == MarkerClassifier.LAYER:
                 layerMarkers.append(m)
-            elif ("traceMarker" in m):
+                layers.append(value)
+            elif category == MarkerClassifier.TRACE:
                 traceMarkers.append(m)
-            elif ("strRepr" in m):
+            elif category == MarkerClassifier.REPR:
                 reprMarkers.append(m)
-            elif (", seq = " in m):
+            elif category == MarkerClassifier.SEQ:
                 seqMarkers.append(m)
+                seqIds.add(value)
             else:
                 otherMarkers.append(m)
 
@@ -271,33 +568,19 @@ class NVVP(object):
 
         #Get markers with seq id (inserted by PyTorch) from the previous kernel to the present kernel
         #Only for fprop kernels
+        self.altSeqRequest = None
         if (len(result) and not bprop):
-            loId = self.markerId
-            hiId = result[-1]['id']
-            self.markerId = hiId
-
-            #Get markers between loId and hiId
-            cmd = 'SELECT id,name from marker where objectId = "{}" and id > {} and id < {} ORDER BY startTime ASC'.format(
-                objId, loId, hiId
-            )
-            result1 = self.db.select(cmd)
-
-            for r in result1:
-                m = self.getString(r['name'])
-                #Get only markers with seq id
-                if (", seq=" in m):
-                    altSeqMarkers.append(m)
-
-            #Remove duplicates, sort and prune altSeqMarkers
-            if (len(altSeqMarkers)):
-                altSeqMarkers = list(set(altSeqMarkers))
-                altSeqMarkers.sort(key=seqcompare)
-                altSeqMarkers = prune(altSeqMarkers)
+            if self.deferAltSeq:
+                #The lookup depends on the previous kernel of any thread.
+                #The caller resolves it in kernel order with getAltSeqMarkers.
+                self.altSeqRequest = result[-1]['id']
+            else:
+                altSeqMarkers = self.getAltSeqMarkers(objId, result[-1]['id'])
 
-        delete(objId, startTime)
+        self.retire(objId, startTime)
 
         return layerMarkers, filterTrace(
             traceMarkers
-        ), reprMarkers, pyprofMarkers, seqMarkers, otherMarkers, altSeqMarkers, getSeqId(seqMarkers), getSeqId(
+        ), reprMarkers, pyprofMarkers, seqMarkers, otherMarkers, altSeqMarkers, sorted(seqIds), getSeqId(
             altSeqMarkers
-        ), getLayerName(layerMarkers)
+        ), layers
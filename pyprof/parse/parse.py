@@ -21,60 +21,323 @@ Parse the SQLite3 database from NVprof or Nsight and print a dictionary for ever
 import sys
 import os
 import argparse
+import glob
+import re
+import heapq
+import pickle
+import tempfile
+from collections import Counter
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
 from .db import DB
-from .kernel import Kernel
-from .nvvp import NVVP
+from .kernel import Kernel, NameCache
+from .launch import LaunchQueue
+from .columns import KernelTable
+from .interchange import (
+    KernelWriter, readKernels, openOutput, resumeOutput, compressedWriter, compressionOf, COMPRESSION
+)
+from .cache import ResultCache
+from .checkpoint import Checkpoint
+from .nvvp import NVVP, getSeqId
 from .nsight import Nsight
+from .sweep import union
+from .sampling import iterationsFromRanges, iterationsFromSeq, sample
+from . import selfprofile
+from .selfprofile import stage, timed
 
 
 def parseArgs():
     parser = argparse.ArgumentParser(prog=sys.argv[0], description="Parse SQLite3 DB from NVprof or Nsight.")
-    parser.add_argument("file", type=str, default=None, help="SQLite3 database.")
+    parser.add_argument(
+        "file", type=str, nargs="+",
+        help="SQLite3 database. Several databases or a glob (e.g. 'net*.sql', one database per rank) "
+        "are parsed concurrently, one worker per database, and merged in rank order."
+    )
+    parser.add_argument(
+        "--attribution", type=str, choices=["sweep", "sql", "rtree"], default="sweep",
+        help="How NVTX markers are attributed to kernels. "
+        "sweep: sort kernels and markers once and sweep them in a single pass (default). "
+        "sql: query a temporary marker table once per kernel. "
+        "rtree: like sql, but the marker table is indexed with an R*Tree on (thread, start, end)."
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=1,
+        help="Number of worker processes. Kernels are partitioned by launching thread. "
+        "With several databases, the number of databases parsed concurrently (default: number of CPUs)."
+    )
+    parser.add_argument(
+        "--columnar", action="store_true",
+        help="Load the kernels into NumPy arrays instead of one dictionary per kernel. "
+        "Faster for large profiles, the output is the same. Cannot be combined with --jobs on a single database."
+    )
+    parser.add_argument(
+        "--format", type=str, choices=["text", "bin"], default="text",
+        help="Output format. text: a Python dictionary per kernel and line (default). "
+        "bin: compact binary format. pyprof.prof detects the format automatically."
+    )
+    parser.add_argument(
+        "--output", "-o", type=str, default=None, metavar="FILE",
+        help="Write to FILE instead of stdout. FILE is compressed if it ends with .gz, .bz2 or .xz."
+    )
+    parser.add_argument(
+        "--compress", type=str, choices=sorted(COMPRESSION.keys()), default=None,
+        help="Compress the output (stdout or --output) with gzip, bz2 or xz. "
+        "pyprof.prof detects the compression automatically."
+    )
+    parser.add_argument(
+        "--name-cache", type=str, nargs="?", const=NameCache.defaultPath(), default=None, metavar="FILE",
+        help="Cache demangled kernel names in a SQLite3 file across runs (default file {}).".format(
+            NameCache.defaultPath()
+        )
+    )
+
+    parser.add_argument(
+        "--memory", action="store_true",
+        help="Also parse memcpy and memset activities. They are attributed to NVTX markers like kernels "
+        "and carry the copy kind, bytes, host memory kind (pinned, pageable) and achieved GB/s."
+    )
+    parser.add_argument(
+        "--no-queue-depth", action="store_true",
+        help="Do not compute the launch queue depth of every kernel (queueDepth is 0). "
+        "The queue holds the sorted launch and start times of all kernels, 16 bytes per kernel."
+    )
+
+    parser.add_argument(
+        "--start-ns", type=int, default=None, metavar="NS",
+        help="Only parse kernels which start at or after NS nanoseconds from the start of the profile."
+    )
+    parser.add_argument(
+        "--end-ns", type=int, default=None, metavar="NS",
+        help="Only parse kernels which start before NS nanoseconds from the start of the profile."
+    )
+    parser.add_argument(
+        "--device", type=int, nargs="+", default=None, metavar="ID",
+        help="Only parse kernels which run on these GPU devices."
+    )
+    parser.add_argument(
+        "--stream", type=int, nargs="+", default=None, metavar="ID", help="Only parse kernels on these streams."
+    )
+    parser.add_argument(
+        "--pid", type=int, nargs="+", default=None, metavar="ID",
+        help="Only parse kernels launched by these processes."
+    )
+    parser.add_argument(
+        "--tid", type=int, nargs="+", default=None, metavar="ID",
+        help="Only parse kernels launched by these threads (tid as printed in the output)."
+    )
+    parser.add_argument(
+        "--within-range", type=str, default=None, metavar="REGEX",
+        help="Only parse kernels launched while an NVTX range whose text matches REGEX "
+        "(e.g. 'iter_[5-9]') is open on any thread."
+    )
+    parser.add_argument(
+        "--sample-every", type=int, default=None, metavar="N",
+        help="Only parse every Nth training iteration. The kernels carry the sampling factor."
+    )
+    parser.add_argument(
+        "--sample-random", type=int, default=None, metavar="K",
+        help="Only parse K randomly chosen training iterations. The kernels carry the sampling factor."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for --sample-random (default 0).")
+    parser.add_argument(
+        "--iteration-marker", type=str, default=None, metavar="REGEX",
+        help="NVTX range (regex) which starts a training iteration for sampling. "
+        "By default iterations start where the PyTorch sequence ids increase again after bprop."
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Do not read or write the parse result cache (<file>.pyprof-cache) next to the database."
+    )
+    parser.add_argument(
+        "--rebuild-cache", action="store_true", help="Ignore the parse result cache and write a new one."
+    )
+
+    parser.add_argument(
+        "--checkpoint-every", type=int, default=None, metavar="N",
+        help="Every N kernels, sync the output file and save a checkpoint to <output>.pyprof-checkpoint "
+        "(default {} with --resume). Requires --output.".format(Checkpoint.defaultEvery)
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Continue an interrupted run from the checkpoint of --output and append to the output. "
+        "Without a checkpoint, start from the first kernel."
+    )
+
+    parser.add_argument(
+        "--self-profile", action="store_true",
+        help="Print the wall time, call count and peak memory of every stage of the parser to stderr."
+    )
+    parser.add_argument(
+        "--self-profile-json", type=str, default=None, metavar="FILE",
+        help="Also write the self profile to a JSON file. Implies --self-profile."
+    )
 
     args = parser.parse_args()
 
-    if not os.path.isfile(args.file):
-        raise parser.error("No such file '{}'.".format(args.file))
+    if args.self_profile_json is not None:
+        args.self_profile = True
+
+    args.files = []
+    for pattern in args.file:
+        for fileName in sorted(glob.glob(pattern), key=naturalKey) or [pattern]:
+            if not os.path.isfile(fileName):
+                raise parser.error("No such file '{}'.".format(fileName))
+            if fileName not in args.files:
+                args.files.append(fileName)
+    args.file = args.files[0]
+
+    if args.jobs < 1:
+        raise parser.error("--jobs must be at least 1.")
+
+    if (args.checkpoint_every is not None) or args.resume:
+        if args.output is None:
+            raise parser.error("--checkpoint-every and --resume require --output.")
+        if (args.compress is not None) or (compressionOf(args.output) is not None):
+            raise parser.error("--checkpoint-every and --resume cannot be combined with compression.")
+        if len(args.files) > 1:
+            raise parser.error("--checkpoint-every and --resume require a single database.")
+        if (args.checkpoint_every is not None) and (args.checkpoint_every < 1):
+            raise parser.error("--checkpoint-every must be at least 1.")
+
+    if args.columnar and (args.jobs > 1) and (len(args.files) == 1):
+        raise parser.error("--columnar cannot be combined with --jobs on a single database.")
+
+    for regex in [args.within_range, args.iteration_marker]:
+        if regex is not None:
+            try:
+                re.compile(regex)
+            except re.error as e:
+                raise parser.error("Invalid regex '{}': {}".format(regex, e))
+
+    if (args.sample_every is not None) and (args.sample_random is not None):
+        raise parser.error("--sample-every and --sample-random are mutually exclusive.")
+
+    for n in [args.sample_every, args.sample_random]:
+        if (n is not None) and (n < 1):
+            raise parser.error("The number of sampled iterations must be at least 1.")
+
+    if (args.within_range is not None) and (args.sample_every or args.sample_random):
+        raise parser.error("--within-range cannot be combined with sampling.")
 
     return args
 
 
+def naturalKey(fileName):
+    """
+	Sort net2.sql before net10.sql.
+	"""
+    return [int(x) if x.isdigit() else x for x in re.split(r"(\d+)", fileName)]
+
+
+def cacheOptions(args):
+    """
+	Options which change the kernel records and hence are part of the cache key.
+	"""
+    return {
+        'start_ns': args.start_ns,
+        'end_ns': args.end_ns,
+        'device': args.device,
+        'stream': args.stream,
+        'pid': args.pid,
+        'tid': args.tid,
+        'within_range': args.within_range,
+        'sample_every': args.sample_every,
+        'sample_random': args.sample_random,
+        'seed': args.seed,
+        'iteration_marker': args.iteration_marker,
+        'memory': args.memory,
+        'no_queue_depth': args.no_queue_depth,
+    }
+
+
+def openDB(dbFile):
+    """
+	Open the profile read-only. The database is read through a memory map
+	with a large page cache and the temporary marker table is kept in memory.
+	"""
+    return DB(dbFile, readOnly=True, mmapSize=1 << 30, cacheSize=-256 * 1024, tempStore="MEMORY")
+
+
 def dbIsNvvp(db):
     cmd = "SELECT * FROM sqlite_master where type='table' AND name='StringTable'"
     result = db.select(cmd)
     return True if len(result) == 1 else False
 
 
-def main():
-    args = parseArgs()
-
-    db = DB(args.file)
-    nvvp = None
+def openBackend(db):
+    """
+	Return the NVprof or the Nsight backend for the database.
+	"""
     if dbIsNvvp(db):
-        nvvp = NVVP(db)
+        return NVVP(db)
     else:
-        nvvp = Nsight(db)
-
-    kInfo = nvvp.getKernelInfo()
-    if len(kInfo) == 0:
-        print("Found 0 kernels. Exiting.", file=sys.stderr)
-        db.close()
-        sys.exit(0)
-    else:
-        print("Found {} kernels. Getting info for each kernel.".format(len(kInfo)), file=sys.stderr)
-
-    nvvp.createMarkerTable()
-
-    prevSeqId = -1
-    prevSubSeqId = -1
-    prevOp = "na"
-
-    Kernel.profStart = nvvp.getProfileStart()
-
-    for i in tqdm(range(len(kInfo)), ascii=True):
-        info = kInfo[i]
+        return Nsight(db)
+
+
+def applyFilters(nvvp, args, profStart, verbose=True):
+    """
+	Push --memory, --start-ns, --end-ns, --device, --stream, --pid, --tid, --within-range and sampling
+	into the kernel query and restrict the markers to the launches of the selected kernels.
+	Returns the sampling factor (None if not sampling).
+	"""
+    nvvp.memory = args.memory
+    filters = nvvp.kernelFilters
+    factor = None
+
+    if args.start_ns is not None:
+        filters.append("kernels.start >= {:d}".format(profStart + args.start_ns))
+
+    if args.end_ns is not None:
+        filters.append("kernels.start < {:d}".format(profStart + args.end_ns))
+
+    for column, ids in [("kernels.deviceId", args.device), ("kernels.streamId", args.stream),
+                        (nvvp.launchPid, args.pid), (nvvp.launchTid, args.tid)]:
+        if ids is not None:
+            filters.append("({}) IN ({})".format(column, ", ".join("{:d}".format(i) for i in ids)))
+
+    windows = None
+    if args.within_range is not None:
+        windows = union(r[:2] for r in nvvp.getRanges(re.compile(args.within_range)))
+
+    elif (args.sample_every is not None) or (args.sample_random is not None):
+        if args.iteration_marker is not None:
+            iterations = iterationsFromRanges(nvvp.getRanges(re.compile(args.iteration_marker)))
+        else:
+            iterations = iterationsFromSeq(nvvp.getRanges(re.compile(", seq = ")), nvvp.classifier)
+        windows, factor = sample(iterations, args.sample_every, args.sample_random, args.seed)
+        if verbose:
+            print(
+                "Sampling {} of {} iterations (factor {}).".format(len(windows), len(iterations), factor),
+                file=sys.stderr
+            )
+        windows = union(windows)
+
+    if windows is not None:
+        nvvp.db.execute("CREATE TEMPORARY TABLE nvtxWindow (start INTEGER PRIMARY KEY, end INTEGER)")
+        for w in windows:
+            nvvp.db.insert("INSERT INTO nvtxWindow VALUES (?, ?)", w)
+        nvvp.nvtxWindows = True
+        #The windows are disjoint, so only the last window starting before the launch can contain it
+        filters.append(
+            "(SELECT w.end FROM nvtxWindow AS w WHERE w.start <= {0} ORDER BY w.start DESC LIMIT 1) >= {0}".format(
+                nvvp.launchStart
+            )
+        )
+
+    if len(filters):
+        nvvp.restrictMarkers()
+
+    return factor
+
+
+def attributeKernel(nvvp, info):
+    """
+	Create a Kernel from a row of kernel info and attribute markers to it.
+	This only depends on the markers of the launching thread.
+	"""
+    with stage("classification"):
         k = Kernel()
 
         #Calculate/encode object ID
@@ -83,65 +346,409 @@ def main():
         #Set kernel info
         k.setKernelInfo(info)
 
-        #Get and set marker and seqid info
-        info = nvvp.getMarkerInfo(k.objId, k.rStartTime, k.rEndTime)
-        k.setMarkerInfo(info)
-
-        #If the seqId contains both 0 and non zero integers, remove 0.
-        if any(seq != 0 for seq in k.seqId) and (0 in k.seqId):
-            k.seqId.remove(0)
-
-        #Set direction (it uses seq id)
-        k.setDirection()
-
-        #Set op
-        k.setOp()
-
-        #The following code is based on heuristics.
-        #TODO: Refactor.
-        #Assign subSeqId, adjust seqId and altSeqId
-        #seqId can be 0.
-        #A kernel can have multiple seqIds both in fprop and bprop.
-        #In bprop, seqIds might not decrease monotonically. I have observed a few blips.
-        if len(k.seqId):
-            assert (k.dir in ["fprop", "bprop"])
-            if (k.dir == "fprop"):
-                #Check if there is a sequence id larger than the previous
-                inc = (k.seqId[-1] > prevSeqId)
-                if inc:
-                    currSeqId = [x for x in k.seqId if x > prevSeqId][0]
-                else:
-                    currSeqId = prevSeqId
+        return classifyKernel(nvvp, k)
+
+
+def classifyKernel(nvvp, k):
+    """
+	Attribute markers to a Kernel whose kernel info is set, and set its direction and op.
+	"""
+    #Get and set marker and seqid info
+    info = nvvp.getMarkerInfo(k.objId, k.rStartTime, k.rEndTime)
+    k.setMarkerInfo(info)
+
+    #If the seqId contains both 0 and non zero integers, remove 0.
+    if any(seq != 0 for seq in k.seqId) and (0 in k.seqId):
+        k.seqId.remove(0)
+
+    #Set direction (it uses seq id)
+    k.setDirection()
+
+    #Set op
+    k.setOp()
+
+    return k
+
+
+def sequenceKernel(k, state):
+    """
+	Assign subSeqId, adjust seqId and altSeqId.
+	This depends on the previous kernel (in output order) and has to run serially.
+	state holds prevSeqId, prevSubSeqId and prevOp.
+	"""
+
+    #The following code is based on heuristics.
+    #TODO: Refactor.
+    #seqId can be 0.
+    #A kernel can have multiple seqIds both in fprop and bprop.
+    #In bprop, seqIds might not decrease monotonically. I have observed a few blips.
+    if len(k.seqId):
+        prevSeqId = state['prevSeqId']
+        prevSubSeqId = state['prevSubSeqId']
+        prevOp = state['prevOp']
+
+        assert (k.dir in ["fprop", "bprop"])
+        if (k.dir == "fprop"):
+            #Check if there is a sequence id larger than the previous
+            inc = (k.seqId[-1] > prevSeqId)
+            if inc:
+                currSeqId = [x for x in k.seqId if x > prevSeqId][0]
             else:
-                currSeqId = k.seqId[0]
+                currSeqId = prevSeqId
+        else:
+            currSeqId = k.seqId[0]
+
+        #if ((currSeqId == prevSeqId) and (k.op == prevOp)):
+        if ((currSeqId == prevSeqId) and (k.op == prevOp)) or ((k.op[0] == "forward") and (k.op == prevOp) and
+                                                               (k.mod[0] in ["LSTMCell", "GRUCell", "RNNCell"])):
+            #The second condition is to trap cases when pytorch does not use cudnn for a LSTMCell.
+            k.subSeqId = prevSubSeqId + 1
+
+        state['prevSeqId'] = currSeqId
+        state['prevSubSeqId'] = k.subSeqId
+        state['prevOp'] = k.op
+
+        #Keep currSeqId in k.seqId, move everything else to k.altSeqId
+        for s in k.seqId:
+            if s != currSeqId:
+                k.seqId.remove(s)
+                k.altSeqId.append(s)
+
+        for s in k.altSeqId:
+            if s == currSeqId:
+                k.altSeqId.remove(s)
+
+        k.altSeqId = list(set(k.altSeqId))
+        if (len(k.altSeqId)):
+            (k.altSeqId).sort()
+
+
+def attributePartition(dbFile, args, threads, profStart, outFile):
+    """
+	Worker for --jobs. Attribute markers to the kernels launched by threads
+	and pickle (index, Kernel) pairs to outFile in kernel order, where index
+	is the position of the kernel in the serial run.
+	"""
+    db = openDB(dbFile)
+    nvvp = openBackend(db)
+    nvvp.deferAltSeq = True
+    Kernel.profStart = profStart
+    applyFilters(nvvp, args, profStart, verbose=False)
+    Kernel.names = NameCache(args.name_cache)
+
+    def partition():
+        for idx, info in enumerate(nvvp.iterKernelInfo()):
+            nvvp.encode_object_id(info)
+            if info['objId'] in threads:
+                yield idx, info
+
+    if args.attribution == "sweep":
+        nvvp.attributeMarkers(info for _, info in partition())
+    elif args.attribution == "rtree":
+        nvvp.createMarkerRTree()
+    else:
+        nvvp.createMarkerTable()
+
+    with open(outFile, "wb") as f:
+        for idx, info in partition():
+            k = attributeKernel(nvvp, info)
+            if isinstance(nvvp, NVVP):
+                k.altSeqRequest = nvvp.altSeqRequest
+            pickle.dump((idx, k), f, pickle.HIGHEST_PROTOCOL)
+
+    stats = Kernel.names.stats()
+    stats['stringLookups'] = nvvp.stringLookups if isinstance(nvvp, NVVP) else 0
+    Kernel.names.close()
+    db.close()
+    return outFile, stats
+
+
+def attributeParallel(args, nvvp, tmpdir, workerStats):
+    """
+	Attribute markers with a process pool. Marker attribution only looks at
+	markers of the launching thread, so the kernels are partitioned by thread
+	and every worker opens its own connection. The partial results are merged
+	back into the order of the serial run. The kernel name cache stats of the
+	workers are added to workerStats.
+	"""
+
+    def load(fileName):
+        with open(fileName, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    break
+
+    #Balance the number of kernels per worker
+    counts = Counter()
+    for info in nvvp.iterKernelInfo():
+        nvvp.encode_object_id(info)
+        counts[info['objId']] += 1
+
+    jobs = min(args.jobs, len(counts))
+    partitions = [[] for _ in range(jobs)]
+    sizes = [0] * jobs
+    for objId, n in counts.most_common():
+        i = sizes.index(min(sizes))
+        partitions[i].append(objId)
+        sizes[i] += n
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(
+                attributePartition, args.file, args, set(threads), Kernel.profStart,
+                os.path.join(tmpdir, "part{}.pkl".format(i))
+            ) for i, threads in enumerate(partitions)
+        ]
+        results = [future.result() for future in futures]
+
+    for _, stats in results:
+        if isinstance(nvvp, NVVP):
+            nvvp.stringLookups += stats['stringLookups']
+        for key in ['hits', 'diskHits', 'misses']:
+            workerStats[key] += stats[key]
+
+    for _, k in heapq.merge(*[load(fileName) for fileName, _ in results], key=lambda x: x[0]):
+        yield k
+
+
+def parseFile(args, out, rank=None, progress=True, checkpoint=None, resume=None):
+    """
+	Parse the database args.file and write the kernel dictionaries to out (a KernelWriter).
+	If rank is not None, every kernel is tagged with it.
+	checkpoint (a Checkpoint) is saved periodically. resume is a checkpoint
+	to continue from, the kernels before it are skipped.
+	"""
+
+    def tag(d):
+        return d if rank is None else dict(d, rank=rank)
+
+    cache = None
+    #The cache holds all kernels, it can neither be read nor written by a resumed run
+    if not args.no_cache and (resume is None):
+        cache = ResultCache(args.file, cacheOptions(args))
+        cached = None if args.rebuild_cache else cache.load()
+        if cached is not None:
+            n = 0
+            for d in timed("cache", cached):
+                with stage("output"):
+                    out.write(tag(d))
+                n += 1
+            print("Read {} kernels from the cache {}.".format(n, cache.path), file=sys.stderr)
+            return
+
+    db = openDB(args.file)
+    nvvp = openBackend(db)
+
+    with stage("kernel query"):
+        Kernel.profStart = nvvp.getProfileStart()
+        factor = applyFilters(nvvp, args, Kernel.profStart, verbose=progress)
+        if args.columnar:
+            table = KernelTable(nvvp, Kernel.profStart)
+            count = len(table)
+        else:
+            count = nvvp.getKernelCount()
+        #The queue depth describes the hardware queue, it counts all kernels and not only the selected ones
+        queue = None
+        if count and not args.no_queue_depth:
+            queue = LaunchQueue(nvvp.launchTimes("rStart"), nvvp.launchTimes("start"))
+    if count == 0:
+        print("Found 0 kernels in {}.".format(args.file), file=sys.stderr)
+        db.close()
+        return
+    else:
+        print("Found {} kernels in {}. Getting info for each kernel.".format(count, args.file), file=sys.stderr)
+
+    state = {'prevSeqId': -1, 'prevSubSeqId': -1, 'prevOp': "na"}
+    skip = 0
+    if resume is not None:
+        state = resume['state']
+        skip = resume['kernels']
+        print("Resuming after {} kernels.".format(skip), file=sys.stderr)
+
+    Kernel.names = NameCache(args.name_cache)
+    nameStats = Counter()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    #The spill files of the workers are removed even if parsing fails
+    try:
+        if args.jobs > 1:
+            #The workers attribute all kernels, the kernels before a checkpoint are dropped
+            kernels = islice(timed("workers", attributeParallel(args, nvvp, tmpdir.name, nameStats)), skip, None)
+            #The alternate seq id lookup depends on the previous kernel of any thread
+            if isinstance(nvvp, NVVP):
+                nvvp.indexMarkers()
+        elif args.columnar:
+            with stage("marker query"):
+                if args.attribution == "sweep":
+                    nvvp.attributeLaunches(table.launches())
+                elif args.attribution == "rtree":
+                    nvvp.createMarkerRTree()
+                else:
+                    nvvp.createMarkerTable()
+
+            def classified():
+                for k in timed("kernel query", table.kernels(skip)):
+                    with stage("classification"):
+                        classifyKernel(nvvp, k)
+                    yield k
+
+            kernels = classified()
+        else:
+            with stage("marker query"):
+                if args.attribution == "sweep":
+                    nvvp.attributeMarkers(timed("kernel query", nvvp.iterKernelInfo()))
+                elif args.attribution == "rtree":
+                    nvvp.createMarkerRTree()
+                else:
+                    nvvp.createMarkerTable()
+            #Kernels are streamed from the database so that memory does not grow with the profile length
+            kernels = (
+                attributeKernel(nvvp, info) for info in islice(timed("kernel query", nvvp.iterKernelInfo()), skip, None)
+            )
+
+        if resume is not None:
+            nvvp.setCursor(resume['cursor'])
+
+        cacheWriter = cache.writer() if cache is not None else None
+
+        n = skip
+        try:
+            for k in tqdm(kernels, total=count, initial=skip, ascii=True, disable=not progress):
+                with stage("seqId heuristics"):
+                    if args.jobs > 1 and isinstance(nvvp, NVVP):
+                        if k.altSeqRequest is not None:
+                            k.altMarkers = nvvp.getAltSeqMarkers(k.objId, k.altSeqRequest)
+                            k.altSeqId = getSeqId(k.altMarkers)
+                        nvvp.retire(k.objId, k.rStartTime)
+
+                    sequenceKernel(k, state)
+
+                if queue is not None:
+                    k.queueDepth = queue.depth(k.device, k.rStartTime)
+
+                with stage("output"):
+                    d = k.toDict()
+                    if factor is not None:
+                        d['sample'] = factor
+                    if cacheWriter is not None:
+                        cacheWriter.write(d)
+                    out.write(tag(d))
+
+                n += 1
+                if (checkpoint is not None) and (n % checkpoint.every == 0):
+                    with stage("checkpoint"):
+                        checkpoint.save(n, out.sync(), state, nvvp.getCursor())
+        except BaseException:
+            #Never leave a partial cache behind
+            if cacheWriter is not None:
+                cache.abort()
+            raise
+
+        if cacheWriter is not None:
+            cache.commit()
+
+        if isinstance(nvvp, NVVP):
+            print(
+                "Resolved {} marker strings from memory (SQLite queries avoided).".format(nvvp.stringLookups),
+                file=sys.stderr
+            )
+
+        nameStats.update(Kernel.names.stats())
+        print(NameCache.report(nameStats), file=sys.stderr)
+        Kernel.names.close()
+    finally:
+        tmpdir.cleanup()
 
-            #if ((currSeqId == prevSeqId) and (k.op == prevOp)):
-            if ((currSeqId == prevSeqId) and (k.op == prevOp)) or ((k.op[0] == "forward") and (k.op == prevOp) and
-                                                                   (k.mod[0] in ["LSTMCell", "GRUCell", "RNNCell"])):
-                #The second condition is to trap cases when pytorch does not use cudnn for a LSTMCell.
-                k.subSeqId = prevSubSeqId + 1
+    db.close()
 
-            prevSeqId = currSeqId
-            prevSubSeqId = k.subSeqId
-            prevOp = k.op
 
-            #Keep currSeqId in k.seqId, move everything else to k.altSeqId
-            for s in k.seqId:
-                if s != currSeqId:
-                    k.seqId.remove(s)
-                    k.altSeqId.append(s)
+def parseRank(args, rank, outFile):
+    """
+	Worker for several databases. Parse the database of a rank into outFile (binary format).
+	The ranks are the unit of parallelism, every rank is parsed by a single process.
+	"""
+    args.file = args.files[rank]
+    args.jobs = 1
+    with open(outFile, "wb") as f:
+        out = KernelWriter(f, "bin")
+        parseFile(args, out, rank=rank, progress=False)
+        out.close()
+    return outFile
+
+
+def parseRanks(args, out):
+    """
+	Parse one database per rank concurrently, at most args.jobs (or the number
+	of CPUs if --jobs is not set) at a time. The kernels are written in rank
+	order, every rank as soon as it and all lower ranks are done.
+	"""
+    jobs = args.jobs if args.jobs > 1 else (os.cpu_count() or 1)
+    jobs = min(jobs, len(args.files))
+    print(
+        "Parsing {} databases with {} worker processes, one process per database.".format(len(args.files), jobs),
+        file=sys.stderr
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(parseRank, args, rank, os.path.join(tmpdir, "rank{}.bin".format(rank)))
+                for rank in range(len(args.files))
+            ]
+            for future in futures:
+                with stage("workers"):
+                    fileName = future.result()
+                with open(fileName, "rb") as f:
+                    for d in timed("input", readKernels(f)):
+                        with stage("output"):
+                            out.write(d)
 
-            for s in k.altSeqId:
-                if s == currSeqId:
-                    k.altSeqId.remove(s)
 
-            k.altSeqId = list(set(k.altSeqId))
-            if (len(k.altSeqId)):
-                (k.altSeqId).sort()
+def main():
+    args = parseArgs()
 
-        k.print()
+    if args.self_profile:
+        selfprofile.start()
+
+    checkpoint = None
+    resume = None
+    if (args.checkpoint_every is not None) or args.resume:
+        checkpoint = Checkpoint(args.output, args.file, dict(cacheOptions(args), format=args.format))
+        if args.resume:
+            resume = checkpoint.load()
+            if resume is None:
+                print("No checkpoint {}, starting from the first kernel.".format(checkpoint.path), file=sys.stderr)
+        if args.checkpoint_every is not None:
+            checkpoint.every = args.checkpoint_every
+        elif resume is not None:
+            checkpoint.every = resume['every']
+
+    if resume is not None:
+        stream = resumeOutput(args.output, resume['offset'])
+    elif args.output is not None:
+        stream = openOutput(args.output, args.compress)
+    elif args.compress is not None:
+        stream = compressedWriter(sys.stdout.buffer, args.compress)
+    else:
+        stream = sys.stdout.buffer
 
-    db.close()
+    out = KernelWriter(stream, args.format)
+    if resume is not None:
+        out.resume()
+    if len(args.files) > 1:
+        parseRanks(args, out)
+    else:
+        parseFile(args, out, checkpoint=checkpoint, resume=resume)
+    with stage("output"):
+        out.close()
+        if stream is not sys.stdout.buffer:
+            stream.close()
+    #The output is complete
+    if checkpoint is not None:
+        checkpoint.remove()
+
+    selfprofile.report("parse", args.self_profile_json)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+R*Tree index of the temporary marker table.
+
+The single column indexes on start and end can only bound one side of an
+"enclosing [t0, t1]" query. The R*Tree stores every marker as a box
+(thread x [start, end]), so both bounds and the thread are used to search it.
+
+R*Tree coordinates are 32 bit floats. Thread ids are replaced by a small
+integer (exact in a float). Absolute timestamps (ns since the epoch for
+NVprof) would be rounded to minutes, so the times are stored as offsets from
+the first marker. SQLite rounds the time intervals outwards, so the R*Tree
+returns a superset of the enclosing markers. The exact comparison is done
+on the marker table.
+"""
+
+
+class IntervalIndex(object):
+    """
+	R*Tree index of the (thread, start, end) columns of a temporary table.
+	"""
+
+    def __init__(self, db, table, thread, start, end):
+        self.db = db
+        self.table = table
+        self.start = start
+        self.end = end
+        rtree = table + "_rtree"
+        threads = table + "_thread"
+
+        db.execute('CREATE TEMPORARY TABLE {} AS SELECT DISTINCT {} AS thread FROM {}'.format(threads, thread, table))
+        db.execute('CREATE VIRTUAL TABLE temp.{} USING rtree(id, minThread, maxThread, minTime, maxTime)'.format(rtree))
+        self.base = db.select('SELECT MIN({}) AS base FROM {}'.format(start, table))[0]['base'] or 0
+        db.execute(
+            'INSERT INTO {} SELECT m.rowid, t.rowid, t.rowid, m.{} - ?, m.{} - ? FROM {} AS m '
+            'JOIN {} AS t ON m.{} = t.thread WHERE m.{} IS NOT NULL'.format(
+                rtree, start, end, table, threads, thread, end
+            ), (self.base, self.base)
+        )
+
+        cmd = 'SELECT rowid, thread FROM {}'.format(threads)
+        self.threads = {r['thread']: r['rowid'] for r in db.select(cmd)}
+
+        self.cmds = {}
+        self.rtree = rtree
+
+    def enclosing(self, columns, thread, start, end):
+        """
+		Select columns of the markers of a thread with marker start < start
+		and marker end > end, in ascending order of marker start.
+		"""
+        t = self.threads.get(thread)
+        if t is None:
+            return []
+
+        cmd = self.cmds.get(columns)
+        if cmd is None:
+            cmd = 'SELECT {} FROM {} AS r JOIN {} AS m ON m.rowid = r.id WHERE \
+					r.minThread <= ? AND r.maxThread >= ? AND \
+					r.minTime < ? AND r.maxTime > ? AND \
+					m.{} < ? AND m.{} > ? \
+					ORDER BY m.{} ASC'.format(
+                ",".join("m." + c for c in columns.split(",")), self.rtree, self.table, self.start, self.end,
+                self.start
+            )
+            self.cmds[columns] = cmd
+        return self.db.select(cmd, (t, t, start - self.base, end - self.base, start, end))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Detect training iterations and sample a subset of them.
+
+An iteration is a (start, end) time interval. It starts with either
+	a user supplied NVTX range (e.g. layer:iter_\\d+) or
+	the first forward seq marker after a backward seq marker, i.e. the point
+	where the PyTorch sequence ids stop decreasing (bprop) and increase again (fprop).
+and lasts until the next iteration starts. The last iteration lasts until
+the end of the profile. Intervals are closed, so an iteration ends 1 ns
+before the next one starts.
+"""
+
+import random
+import sys
+
+from .markers import MarkerClassifier
+
+
+def iterationsFromRanges(ranges):
+    """
+	Iterations delimited by the (start, end, text) of the user supplied NVTX ranges.
+	"""
+    starts = sorted(set(r[0] for r in ranges))
+    return [(s, e - 1) for s, e in zip(starts, starts[1:] + [sys.maxsize])]
+
+
+def iterationsFromSeq(ranges, classifier=None):
+    """
+	Iterations delimited by the (start, end, text) of the PyTorch seq markers.
+	The markers are classified (and cached by their text) by the MarkerClassifier
+	which labels the kernels, so both agree on what is backward. Ignored markers
+	(gradient checkpointing) neither start nor end an iteration.
+	"""
+    if classifier is None:
+        classifier = MarkerClassifier()
+    starts = []
+    prevBackward = True
+    for start, _, text in sorted(ranges):
+        category, backward, _ = classifier.get(text, text)
+        if category == MarkerClassifier.IGNORE:
+            continue
+        if prevBackward and not backward:
+            starts.append(start)
+        prevBackward = backward
+    return [(s, e - 1) for s, e in zip(starts, starts[1:] + [sys.maxsize])]
+
+
+def sample(iterations, every=None, count=None, seed=0):
+    """
+	Select every Nth iteration (starting with the first) or count random iterations.
+	Returns the selected iterations and the sampling factor i.e.
+	the number of iterations divided by the number of selected iterations.
+	"""
+    if every is not None:
+        selected = iterations[::every]
+    else:
+        rng = random.Random(seed)
+        selected = sorted(rng.sample(iterations, min(count, len(iterations))))
+
+    if len(selected) == 0:
+        return [], None
+    return selected, float(len(iterations)) / len(selected)
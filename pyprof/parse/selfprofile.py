@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Self profiling of parse.py and prof.py (--self-profile).
+
+Code is attributed to a stage with
+	with stage("marker query"):
+		...
+For every stage we record
+	calls: number of times the stage was entered
+	wall : wall time in seconds, excluding nested stages
+	peak : peak memory allocated by Python (tracemalloc) while in the stage
+	rss  : growth of the peak resident set size (getrusage) while in the stage
+Stages can be nested. Time spent outside of any stage is reported as "other".
+tracemalloc slows down allocation heavy code, so the wall times are inflated.
+Only the main process is profiled, not the worker processes of --jobs.
+"""
+
+import json
+import resource
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+enabled = False
+stages = OrderedDict()
+_stack = []
+_start = None
+
+
+def maxrss():
+    """
+	Peak resident set size in KiB.
+	"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class _Null(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_null = _Null()
+
+
+class _Stage(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        #The peak of the enclosing stage up to now
+        if len(_stack):
+            _stack[-1][2] = max(_stack[-1][2], peak)
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        #[name, start, peak, time in nested stages, maxrss at entry]
+        _stack.append([self.name, time.perf_counter(), 0, 0.0, maxrss()])
+        return self
+
+    def __exit__(self, *args):
+        name, start, peak, nested, rss = _stack.pop()
+        elapsed = time.perf_counter() - start
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+
+        s = stages.setdefault(name, {'calls': 0, 'wall': 0.0, 'peak': 0, 'rss': 0})
+        s['calls'] += 1
+        s['wall'] += elapsed - nested
+        s['peak'] = max(s['peak'], peak)
+        s['rss'] += maxrss() - rss
+
+        if len(_stack):
+            _stack[-1][2] = max(_stack[-1][2], peak)
+            _stack[-1][3] += elapsed
+        return False
+
+
+def start():
+    """
+	Enable the self profiling.
+	"""
+    global enabled, _start
+    enabled = True
+    tracemalloc.start()
+    _start = time.perf_counter()
+
+
+def stage(name):
+    """
+	Context manager attributing the enclosed code to a stage.
+	It does nothing unless the self profiling is enabled.
+	"""
+    return _Stage(name) if enabled else _null
+
+
+def timed(name, iterable):
+    """
+	Attribute the time to produce every item of an iterable (e.g. a generator
+	reading from the database) to a stage.
+	"""
+    if not enabled:
+        return iter(iterable)
+
+    def gen():
+        it = iter(iterable)
+        while True:
+            with stage(name):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+            yield item
+
+    return gen()
+
+
+def summary(tool):
+    wall = time.perf_counter() - _start
+    result = OrderedDict()
+    result['tool'] = tool
+    result['argv'] = sys.argv[1:]
+    result['time'] = time.time()
+    result['wall'] = wall
+    result['peak'] = tracemalloc.get_traced_memory()[1]
+    result['maxrss'] = maxrss()
+    result['stages'] = OrderedDict((name, dict(s)) for name, s in stages.items())
+    other = wall - sum(s['wall'] for s in stages.values())
+    result['stages']['other'] = {'calls': 1, 'wall': other, 'peak': 0, 'rss': 0}
+    return result
+
+
+def report(tool, jsonFile=None):
+    """
+	Print the breakdown per stage to stderr and optionally write it to a JSON file.
+	"""
+    if not enabled:
+        return
+    result = summary(tool)
+    wall = result['wall']
+    print("Self profile of {}: {:.3f} s wall, {:.1f} MiB peak traced, {:.1f} MiB max RSS".format(
+        tool, wall, result['peak'] / 2.0**20, result['maxrss'] / 2.0**10), file=sys.stderr)
+    print("{:20} {:>10} {:>10} {:>7} {:>12} {:>12}".format("Stage", "Calls", "Wall(s)", "%", "Peak(MiB)", "RSS+(MiB)"),
+          file=sys.stderr)
+    for name, s in result['stages'].items():
+        print(
+            "{:20} {:10d} {:10.3f} {:7.1f} {:12.1f} {:12.1f}".format(
+                name, s['calls'], s['wall'], 100.0 * s['wall'] / wall if wall > 0 else 0, s['peak'] / 2.0**20,
+                s['rss'] / 2.0**10
+            ), file=sys.stderr
+        )
+
+    if jsonFile is not None:
+        with open(jsonFile, "w") as f:
+            json.dump(result, f, indent=2)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Single pass (sweep line) attribution of NVTX markers to kernel launches.
+
+Instead of querying the marker table once per kernel, the launches and the
+markers are sorted by (thread, start time) and swept together. For every
+thread we keep the list of markers which are still open, so the markers
+enclosing a launch can be read off the active list.
+"""
+
+from itertools import groupby
+from operator import itemgetter
+
+
+def attribute(launches, markers):
+    """
+	Find the markers enclosing every launch.
+
+	launches: iterable of (thread, start, end) tuples.
+	markers : iterable of (thread, start, end, row) tuples.
+
+	A marker encloses a launch if it is on the same thread and
+	marker start < launch start and marker end > launch end.
+	Markers without an end (instantaneous markers) never enclose anything.
+
+	Returns a dictionary mapping every (thread, start, end) launch to a
+	tuple of the enclosing rows, in ascending order of marker start.
+	"""
+
+    key = itemgetter(0)
+
+    # Group the markers per thread, sorted by start time
+    markers = sorted((m for m in markers if m[2] is not None), key=itemgetter(0, 1))
+    perThread = {t: list(g) for t, g in groupby(markers, key=key)}
+
+    result = {}
+    launches = sorted(set(launches), key=itemgetter(0, 1, 2))
+    for thread, group in groupby(launches, key=key):
+        mlist = perThread.get(thread, [])
+        n = len(mlist)
+        i = 0
+        active = []
+        prev = ()
+        for launch in group:
+            _, start, end = launch
+
+            # Open all markers which started before this launch
+            while (i < n) and (mlist[i][1] < start):
+                active.append(mlist[i])
+                i += 1
+
+            # Launches are visited in increasing start time, so a marker which
+            # ended before this launch started cannot enclose any later launch.
+            active = [m for m in active if m[2] > start]
+
+            rows = tuple(m[3] for m in active if m[2] > end)
+
+            # Consecutive launches are usually wrapped by the same markers.
+            # Share the tuple to keep the memory footprint small.
+            if rows == prev:
+                rows = prev
+            prev = rows
+            result[launch] = rows
+
+    return result
+
+
+def union(intervals):
+    """
+	Merge overlapping (start, end) intervals.
+	Returns a sorted list of disjoint intervals.
+	"""
+    merged = []
+    for start, end in sorted(intervals):
+        if len(merged) and (start <= merged[-1][1]):
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def overlap(a, b):
+    """
+	Total length of the intersection of two lists of disjoint sorted
+	(start, end) intervals e.g. the output of union.
+	"""
+    total = 0
+    i = j = 0
+    while (i < len(a)) and (j < len(b)):
+        lo = max(a[i][0], b[j][0])
+        hi = min(a[i][1], b[j][1])
+        if hi > lo:
+            total += hi - lo
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
@@ -17,6 +17,7 @@
 
 from .base import OperatorLayerBase
 from .tensor import Tensor
+from ..parse.markers import decode
 
 
 class Activation(OperatorLayerBase):
@@ -31,7 +32,7 @@ class Activation(OperatorLayerBase):
     ]
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -20,12 +20,13 @@ from .tc import TC_Whitelist
 from .utility import Utility
 from .base import OperatorLayerBase
 import numpy as np
+from ..parse.markers import decode
 
 
 class Addmm(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -109,7 +110,7 @@ class Addmm(OperatorLayerBase):
 class Bmm(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -173,7 +174,7 @@ class Matmul(OperatorLayerBase):
     NON_TC = NON_GEMM + ["dot_kernel"]
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -308,7 +309,7 @@ class Matmul(OperatorLayerBase):
 class Mm(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
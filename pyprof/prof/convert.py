@@ -17,6 +17,7 @@
 
 from .base import OperatorLayerBase
 from .tensor import Tensor
+from ..parse.markers import decode
 
 
 class Convert(OperatorLayerBase):
@@ -26,7 +27,7 @@ class Convert(OperatorLayerBase):
     ops = ["byte", "char", "double", "float", "half", "int", "long", "short", "to"]
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -26,6 +26,8 @@ class Data(object):
     def __init__(self, kernel):
         #Available from NVprof
         self.tid = kernel['tid']
+        self.pid = kernel.get('pid', 0)
+        self.rank = kernel.get('rank', 0)  #position of the database on the parse.py command line
         self.device = kernel['device']
         self.stream = kernel['stream']
         self.grid = str(kernel['grid']).replace(" ", "").replace("(", "").replace(")", "")
@@ -33,6 +35,16 @@ class Data(object):
         self.name = kernel['kShortName'].replace(" ", "_")
         self.lName = kernel['kLongName']
         self.sil = kernel['kDuration']  #units ns
+        self.sample = kernel.get('sample', 1)  #sampling factor of parse.py
+        self.start = kernel.get('start', 0)  #units ns from the start of the profile
+        self.launch = kernel.get('launch', 0)  #units ns, duration of the launch API call
+        self.latency = kernel.get('latency', 0)  #units ns, from launch to start on the GPU
+        self.queue = kernel.get('queueDepth', 0)  #launched but not started kernels at launch
+
+        #memcpy and memset (parse.py --memory)
+        self.type = kernel.get('type', "kernel")
+        self.copy = kernel.get('copyKind') or "na"
+        self.hostMem = kernel.get('hostMem') or "na"
 
         self.index = None
 
@@ -56,6 +68,7 @@ class Data(object):
         self.tc = "na"
         self.flops = 0
         self.bytes = 0
+        self.bw = "na"
 
     def setParams(self, params):
         # TODO: Remove the else block after refactoring.
@@ -74,3 +87,8 @@ class Data(object):
                       qaz += "{}".format(value)
           
           self.params = qaz.replace(" ", "")
+
+    def setBytes(self, bytes):
+        self.bytes = bytes
+        #Achieved bandwidth in GB/s i.e. bytes per ns
+        self.bw = "{:.2f}".format(float(bytes) / self.sil) if (bytes and self.sil) else "na"
@@ -17,11 +17,12 @@
 
 from .base import OperatorLayerBase
 from .tensor import Tensor
+from ..parse.markers import decode
 
 class Dropout(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -22,12 +22,13 @@ from .base import OperatorLayerBase
 from .tensor import Tensor
 from functools import reduce
 import operator
+from ..parse.markers import decode
 
 
 class Cat(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -76,7 +77,7 @@ class Cat(OperatorLayerBase):
 class Reshape(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -122,7 +123,7 @@ class Reshape(OperatorLayerBase):
 class Gather(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -173,7 +174,7 @@ class Gather(OperatorLayerBase):
 class MaskedScatter(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -231,7 +232,7 @@ class MaskedScatter(OperatorLayerBase):
 class Nonzero(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -286,7 +287,7 @@ class Nonzero(OperatorLayerBase):
 class IndexSelect(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -371,7 +372,7 @@ class IndexSelect(OperatorLayerBase):
 class MaskedSelect(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -19,6 +19,7 @@ from collections import OrderedDict
 from .tc import TC_Whitelist
 from .utility import Utility
 from .base import OperatorLayerBase
+from ..parse.markers import decode
 
 
 class Linear(OperatorLayerBase):
@@ -99,7 +100,7 @@ class Linear(OperatorLayerBase):
         self.dir = d.dir
         self.sub = d.sub
 
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -18,6 +18,7 @@
 from collections import OrderedDict
 from .utility import Utility
 from .base import OperatorLayerBase
+from ..parse.markers import decode
 
 #TODO: Add support for additional loss functions.
 
@@ -25,7 +26,7 @@ from .base import OperatorLayerBase
 class MSELoss(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
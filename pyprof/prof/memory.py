@@ -16,9 +16,10 @@
 
 from .base import OperatorLayerBase
 from .tensor import Tensor
+from ..parse.markers import decode
 
 def readMarker(d):
-    marker = eval(d.argMarker[0])
+    marker = decode(d.argMarker[0])
     return marker['mod'], marker['op'], marker['args']
 
 class OneZero(OperatorLayerBase):
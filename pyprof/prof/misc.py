@@ -18,6 +18,7 @@
 from collections import OrderedDict
 from .utility import Utility
 from .base import OperatorLayerBase
+from ..parse.markers import decode
 
 
 class Foo(OperatorLayerBase):
@@ -26,7 +27,7 @@ class Foo(OperatorLayerBase):
 	"""
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -70,7 +71,7 @@ class Foo(OperatorLayerBase):
 class Copy(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -119,7 +120,7 @@ class Copy(OperatorLayerBase):
 class Clone(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -162,7 +163,7 @@ class Clone(OperatorLayerBase):
 class Contiguous(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -202,7 +203,7 @@ class Contiguous(OperatorLayerBase):
 class Any(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
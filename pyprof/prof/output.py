@@ -30,6 +30,8 @@ class Output():
         "seq": ["SeqId", "seqId", str, 7],
         "altseq": ["AltSeqId", "altSeqId", str, 7],
         "tid": ["TId", "tid", int, 12],
+        "pid": ["PId", "pid", int, 8],
+        "rank": ["Rank", "rank", int, 4],
         "layer": ["Layer", "layer", str, 10],
         "trace": ["Trace", "trace", str, 25],
         "dir": ["Direction", "dir", str, 5],
@@ -45,7 +47,14 @@ class Output():
         "grid": ["Grid", "grid", str, 12],
         "block": ["Block", "block", str, 12],
         "flops": ["FLOPs", "flops", int, 12],
-        "bytes": ["Bytes", "bytes", int, 12]
+        "bytes": ["Bytes", "bytes", int, 12],
+        "bw": ["GB/s", "bw", str, 8],
+        "type": ["Type", "type", str, 6],
+        "copy": ["Copy", "copy", str, 4],
+        "mem": ["Memory", "hostMem", str, 8],
+        "launch": ["Launch(ns)", "launch", int, 10],
+        "latency": ["Latency(ns)", "latency", int, 11],
+        "queue": ["Queue", "queue", int, 5]
     }
 
     def __init__(self, args):
@@ -114,6 +123,17 @@ class Output():
             else:
                 sys.exit(-1)
 
+    def report(self, header, rows):
+        """
+		Print a report table (e.g. --summary, --idle) with a header and one
+		column per field, each as wide as its longest value. Strings are left aligned.
+		"""
+        widths = [max(len(str(r[i])) for r in rows + [header]) for i in range(len(header))]
+        pformat = " ".join("%{}{}s".format("-" if type(rows[0][i]) is str else "", w) for i, w in enumerate(widths))
+        self.foo(tuple(header), pformat)
+        for r in rows:
+            self.foo(r, pformat)
+
     def header(self):
         cadena = ()
         for col in self.cols:
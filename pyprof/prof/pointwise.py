@@ -20,6 +20,7 @@ from .base import OperatorLayerBase
 from .tensor import Tensor
 from functools import reduce
 import operator
+from ..parse.markers import decode
 
 class Pointwise(OperatorLayerBase):
 
@@ -93,7 +94,7 @@ class Pointwise(OperatorLayerBase):
           error + misc
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -49,20 +49,26 @@ from .normalization import BatchNorm
 from .randomSample import RandPerm
 from .loss import MSELoss
 from .data import Data
+from .summary import Summary
+from .timeline import Timeline
+from .trace import ChromeTrace
 from .memory import OneZero, Fill, Full
+from ..parse.interchange import readKernels
+from ..parse import selfprofile
+from ..parse.selfprofile import stage, timed
 
 
-def findFpropKernel(seq):
-    #Find the last fprop kernel with the same seqId
+def findFpropKernel(seq, rank=0):
+    #Find the last fprop kernel with the same seqId (of the same rank)
     #First look at seqId and then at altSeqId
     for idx in reversed(range(len(kernels))):
         k = kernels[idx]
-        if (seq in k['seqId']) and (k['dir'] == "fprop"):
+        if (seq in k['seqId']) and (k['dir'] == "fprop") and (k.get('rank', 0) == rank):
             return idx
 
     for idx in reversed(range(len(kernels))):
         k = kernels[idx]
-        if (seq in k['altSeqId']) and (k['dir'] == "fprop"):
+        if (seq in k['altSeqId']) and (k['dir'] == "fprop") and (k.get('rank', 0) == rank):
             return idx
 
     return -1
@@ -202,85 +208,119 @@ def foo(mod, op, d):
 def main():
     #Read cmd line arguments
     cmdArgs = parseArgs()
+    if cmdArgs.self_profile:
+        selfprofile.start()
 
     output = Output(cmdArgs)
-    output.header()
+    summary = Summary(output) if cmdArgs.summary else None
+    timeline = Timeline(output, cmdArgs.idle) if cmdArgs.idle is not None else None
+    trace = ChromeTrace(cmdArgs.chrome_trace) if cmdArgs.chrome_trace is not None else None
+    if (summary is None) and (timeline is None):
+        output.header()
 
     idx = -1
     #Read in all the kernel info
-    for line in cmdArgs.file:
+    for kernel in timed("input", readKernels(cmdArgs.file)):
         idx += 1
-        kernel = eval(line)
         assert (kernel)
         kernels.append(kernel)
 
-        k = kernel
-        d = Data(k)
-
-        mod = k['mod']
-        op = k['op']
-
-        flops = 0
-        params = {"na": "na"}
-        tc = "na"
-        bytes = 0
-
-        if (d.dir == "bprop"):
-            d.seqMarker = k['seqMarker']
-            seq = k['seqId']
-            if len(seq) > 1:
-                pass
-            seq = k['seqId'][:1]
-            assert (len(seq) == 1), seq
-            #assert (seq[0] != 0)
-            assert (len(d.seqMarker) > 0)
-            #If there is no useful marker associated, use the
-            #sequence number to find the kernel from fprop
-            if len(d.argMarker) == 0:
-                index = findFpropKernel(seq[0])
-                if index >= 0:
-                    d.argMarker = kernels[index]['marker']
-                    d.modMarker = kernels[index]['reprMarkers']
-                    mod = kernels[index]['mod']
-                    op = kernels[index]['op']
-
-                    d.layer = kernels[index]['layer']
-                    d.trace = kernels[index]['trace']
-
-        # Check if marker has our annotations
-        if len(d.argMarker) and Utility.hasNVTX(d.argMarker[0]):
-
-            xx = foo(mod, op, d)
-
-            bytes = xx.bytes()
-            flops = xx.flops()
-            op = xx.op()
-            params = xx.params()
-            tc = xx.tc()
-
-        if type(op) is list:
-            if len(op):
-                op = op[0]
-            else:
-                op = ""
-
-        if type(mod) is list:
-            if len(mod):
-                mod = mod[0]
-            else:
-                mod = ""
-
-        d.index = idx + 1
-
-        # The following 8 come from operator class functions.
-        d.setParams(params)
-        d.tc = tc
-        d.flops = flops
-        d.bytes = bytes
-        d.mod = mod
-        d.op = op
-
-        output.data(d)
+        with stage("operator analysis"):
+            k = kernel
+            d = Data(k)
+
+            mod = k['mod']
+            op = k['op']
+
+            flops = 0
+            params = {"na": "na"}
+            tc = "na"
+            bytes = 0
+
+            if (d.dir == "bprop"):
+                d.seqMarker = k['seqMarker']
+                seq = k['seqId']
+                if len(seq) > 1:
+                    pass
+                seq = k['seqId'][:1]
+                assert (len(seq) == 1), seq
+                #assert (seq[0] != 0)
+                assert (len(d.seqMarker) > 0)
+                #If there is no useful marker associated, use the
+                #sequence number to find the kernel from fprop
+                if len(d.argMarker) == 0:
+                    index = findFpropKernel(seq[0], d.rank)
+                    if index >= 0:
+                        d.argMarker = kernels[index]['marker']
+                        d.modMarker = kernels[index]['reprMarkers']
+                        mod = kernels[index]['mod']
+                        op = kernels[index]['op']
+
+                        d.layer = kernels[index]['layer']
+                        d.trace = kernels[index]['trace']
+
+            if d.type != "kernel":
+                #memcpy / memset, the size is known
+                bytes = k['bytes']
+                params = {"kind": d.copy, "mem": d.hostMem} if d.type == "memcpy" else {"mem": d.hostMem}
+
+            # Check if marker has our annotations
+            elif len(d.argMarker) and Utility.hasNVTX(d.argMarker[0]):
+
+                xx = foo(mod, op, d)
+
+                bytes = xx.bytes()
+                flops = xx.flops()
+                op = xx.op()
+                params = xx.params()
+                tc = xx.tc()
+
+            if type(op) is list:
+                if len(op):
+                    op = op[0]
+                else:
+                    op = ""
+
+            if (op == "") and (d.type != "kernel"):
+                op = d.type
+
+            if type(mod) is list:
+                if len(mod):
+                    mod = mod[0]
+                else:
+                    mod = ""
+
+            d.index = idx + 1
+
+            # The following 8 come from operator class functions.
+            d.setParams(params)
+            d.tc = tc
+            d.flops = flops
+            d.setBytes(bytes)
+            d.mod = mod
+            d.op = op
+
+        with stage("output"):
+            if summary is not None:
+                summary.add(d)
+            if timeline is not None:
+                timeline.add(d)
+            if trace is not None:
+                trace.add(d)
+            if (summary is None) and (timeline is None):
+                output.data(d)
+
+    with stage("output"):
+        if summary is not None:
+            summary.print()
+        if timeline is not None:
+            if summary is not None:
+                print("")
+            timeline.print()
+        if trace is not None:
+            trace.close()
+
+    selfprofile.report("prof", cmdArgs.self_profile_json)
 
 
 kernels = []
@@ -18,12 +18,13 @@
 from collections import OrderedDict
 from .utility import Utility
 from .base import OperatorLayerBase
+from ..parse.markers import decode
 
 
 class RandPerm(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
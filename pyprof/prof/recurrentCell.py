@@ -19,6 +19,7 @@ from collections import OrderedDict
 from .tc import TC_Whitelist
 from .utility import Utility
 from .base import OperatorLayerBase
+from ..parse.markers import decode
 
 
 def hasTileSize(name):
@@ -45,7 +46,7 @@ class RNNCell(OperatorLayerBase):
 	"""
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -19,12 +19,13 @@ from collections import OrderedDict
 from .utility import Utility
 from .base import OperatorLayerBase
 from .tensor import Tensor
+from ..parse.markers import decode
 
 
 class Mean(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -79,7 +80,7 @@ class Mean(OperatorLayerBase):
 class Sum(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
@@ -134,7 +135,7 @@ class Sum(OperatorLayerBase):
 class Norm(OperatorLayerBase):
 
     def __init__(self, d):
-        marker = eval(d.argMarker[0])
+        marker = decode(d.argMarker[0])
         mod = marker['mod']
         op = marker['op']
         args = marker['args']
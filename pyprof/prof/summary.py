@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+from collections import OrderedDict
+
+from ..parse.sweep import union, overlap
+
+
+class Summary(object):
+    """
+	Totals per (direction, module, op), sorted by silicon time.
+	Kernels of a sampled profile (parse.py --sample-*) are weighted by the
+	sampling factor, so the totals estimate the full run.
+	If the input holds several ranks (parse.py with several databases), the
+	silicon time of the fastest and the slowest rank and the imbalance
+	(slowest / mean) are reported for every op, followed by the totals per rank.
+	If the input holds memcpy / memset records (parse.py --memory), the
+	transfers per copy kind and host memory kind (pinned, pageable) and the
+	memcpy time which overlaps kernels on the same device are reported as well.
+	"""
+
+    header = ["Direction", "Module", "Op", "Count", "Sil(ns)", "FLOPs", "Bytes"]
+    rankHeader = ["MinSil(ns)", "MaxSil(ns)", "Imbalance"]
+
+    def __init__(self, output):
+        self.output = output
+        self.rows = OrderedDict()
+        self.ranks = set()
+        self.sampled = False
+        self.transfers = OrderedDict()
+        self.intervals = OrderedDict()  #(rank, device) -> [kernels, memcpys, weight]
+
+    def add(self, d):
+        key = (d.dir or "na", d.mod or "na", d.op or "na")
+        row = self.rows.setdefault(key, {}).setdefault(d.rank, [0, 0, 0, 0])
+        self.ranks.add(d.rank)
+        w = d.sample
+        if w != 1:
+            self.sampled = True
+        row[0] += w
+        row[1] += w * d.sil
+        row[2] += w * d.flops
+        row[3] += w * d.bytes
+
+        if d.type != "kernel":
+            row = self.transfers.setdefault((d.type, d.copy, d.hostMem), [0, 0, 0])
+            row[0] += w
+            row[1] += w * d.bytes
+            row[2] += w * d.sil
+
+        if d.type in ["kernel", "memcpy"]:
+            intervals = self.intervals.setdefault((d.rank, d.device), [[], [], w])
+            intervals[0 if d.type == "kernel" else 1].append((d.start, d.start + d.sil))
+
+    @staticmethod
+    def imbalance(values):
+        """
+		Slowest / mean. 1.00 is perfectly balanced.
+		"""
+        mean = float(sum(values)) / len(values)
+        return "{:.2f}".format(max(values) / mean) if mean > 0 else "-"
+
+    def print(self):
+        ranks = sorted(self.ranks)
+        multi = len(ranks) > 1
+
+        total = [0, 0, 0, 0]
+        perRank = {r: [0, 0, 0, 0] for r in ranks}
+        rows = []
+        for key, byRank in self.rows.items():
+            row = [sum(x) for x in zip(*byRank.values())]
+            total = [t + x for t, x in zip(total, row)]
+            for r, x in byRank.items():
+                perRank[r] = [t + y for t, y in zip(perRank[r], x)]
+            cols = key + tuple(int(round(x)) for x in row)
+            if multi:
+                sil = [byRank[r][1] if r in byRank else 0 for r in ranks]
+                cols += (int(round(min(sil))), int(round(max(sil))), self.imbalance(sil))
+            rows.append(cols)
+        rows.sort(key=lambda r: r[4], reverse=True)
+
+        cols = ("Total", "-", "-") + tuple(int(round(x)) for x in total)
+        if multi:
+            sil = [perRank[r][1] for r in ranks]
+            cols += (int(round(min(sil))), int(round(max(sil))), self.imbalance(sil))
+        rows.append(cols)
+
+        if self.sampled:
+            print("Totals are scaled by the sampling factor of parse.py.", file=sys.stderr)
+        self.output.report(self.header + (self.rankHeader if multi else []), rows)
+
+        if multi:
+            print("")
+            self.output.report(["Rank", "Count", "Sil(ns)", "FLOPs", "Bytes"],
+                               [(r, ) + tuple(int(round(x)) for x in perRank[r]) for r in ranks])
+
+        if len(self.transfers):
+            print("")
+            self.printTransfers()
+
+    def printTransfers(self):
+        rows = []
+        for (type_, copy, mem), (count, bytes, sil) in self.transfers.items():
+            bw = "{:.2f}".format(float(bytes) / sil) if sil > 0 else "-"
+            rows.append((type_, copy, mem, int(round(count)), int(round(bytes)), int(round(sil)), bw))
+        rows.sort(key=lambda r: r[5], reverse=True)
+        self.output.report(["Type", "Copy", "Memory", "Count", "Bytes", "Sil(ns)", "GB/s"], rows)
+
+        rows = []
+        for (rank, device), (kernels, copies, w) in self.intervals.items():
+            if len(copies) == 0:
+                continue
+            copies = union(copies)
+            copyTime = sum(e - s for s, e in copies)
+            both = overlap(union(kernels), copies)
+            pct = "{:.1f}".format(100.0 * both / copyTime) if copyTime > 0 else "-"
+            rows.append((rank, device, int(round(w * copyTime)), int(round(w * both)), pct))
+        if len(rows):
+            print("")
+            self.output.report(["Rank", "Device", "Memcpy(ns)", "Overlap(ns)", "Overlap(%)"], rows)
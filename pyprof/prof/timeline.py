@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+
+def busyIntervals(starts, ends):
+    """
+	Union of the [start, end) intervals of GPU activities.
+	Returns the busy time, the idle time and the idle gaps (start, end) between
+	the first start and the last end.
+	"""
+    order = np.argsort(starts, kind="stable")
+    s = starts[order]
+    e = ends[order]
+
+    #runEnd[i] is the end of the busy interval which contains activity i
+    runEnd = np.maximum.accumulate(e)
+
+    gap = s[1:] > runEnd[:-1]
+    gapStart = runEnd[:-1][gap]
+    gapEnd = s[1:][gap]
+    idle = int((gapEnd - gapStart).sum())
+    busy = int(runEnd[-1] - s[0]) - idle
+    return busy, idle, np.stack([gapStart, gapEnd], axis=1)
+
+
+class Timeline(object):
+    """
+	GPU busy / idle time per device and per stream, and the largest idle gaps.
+	A device is idle when none of its streams runs a kernel, memcpy or memset.
+	Every gap is attributed to the op and the trace of the host side op which
+	was launched last (by any thread of the rank, on any device) before the gap
+	started, i.e. the last work the host issued before the GPU ran dry.
+	The launch time is start - latency, without parse.py latencies it is the start.
+	Utilization is measured from the first start to the last end on the device.
+	"""
+
+    header = ["Rank", "Device", "Stream", "Busy(ns)", "Idle(ns)", "Util(%)"]
+    gapHeader = ["Rank", "Device", "Start(ns)", "Idle(ns)", "Direction", "Op", "Trace"]
+
+    def __init__(self, output, gaps=10):
+        self.output = output
+        self.gaps = gaps
+        self.devices = OrderedDict()  #(rank, device) -> [starts, ends, streams]
+        self.launches = {}  #rank -> [launch times, indices]
+        self.records = []  #(dir, op, trace) of every activity
+        self.sampled = False
+
+    def add(self, d):
+        if d.sample != 1:
+            self.sampled = True
+        activities = self.devices.setdefault((d.rank, d.device), [[], [], []])
+        activities[0].append(d.start)
+        activities[1].append(d.start + d.sil)
+        activities[2].append(d.stream)
+        launches = self.launches.setdefault(d.rank, [[], []])
+        launches[0].append(d.start - d.latency)
+        launches[1].append(len(self.records))
+        trace = d.trace[-1].split("/")[-1] if len(d.trace) else "-"
+        self.records.append((d.dir or "na", d.op or "na", trace))
+
+    @staticmethod
+    def util(busy, idle):
+        total = busy + idle
+        return "{:.1f}".format(100.0 * busy / total) if total > 0 else "-"
+
+    def print(self):
+        if len(self.devices) == 0:
+            return
+
+        if self.sampled:
+            print("The idle time of a sampled profile includes the iterations skipped by parse.py.", file=sys.stderr)
+
+        #Launch times of every rank in ascending order
+        launches = {}
+        for rank, (times, indices) in self.launches.items():
+            times = np.array(times, dtype=np.int64)
+            order = np.argsort(times, kind="stable")
+            launches[rank] = (times[order], np.array(indices, dtype=np.int64)[order])
+
+        rows = []
+        gaps = []
+        for (rank, device), (starts, ends, streams) in self.devices.items():
+            starts = np.array(starts, dtype=np.int64)
+            ends = np.array(ends, dtype=np.int64)
+            streams = np.array(streams, dtype=np.int64)
+
+            busy, idle, intervals = busyIntervals(starts, ends)
+            rows.append((rank, device, "all", busy, idle, self.util(busy, idle)))
+            times, indices = launches[rank]
+            #The activity launched last at or before the start of every gap
+            last = np.searchsorted(times, intervals[:, 0], side="right") - 1
+            for (gStart, gEnd), i in zip(intervals.tolist(), last.tolist()):
+                gaps.append((rank, device, gStart, gEnd - gStart) + self.records[indices[max(i, 0)]])
+
+            for stream in np.unique(streams).tolist():
+                mask = streams == stream
+                sBusy, sIdle, _ = busyIntervals(starts[mask], ends[mask])
+                rows.append((rank, device, str(stream), sBusy, sIdle, self.util(sBusy, sIdle)))
+
+        self.output.report(self.header, rows)
+
+        gaps.sort(key=lambda g: g[3], reverse=True)
+        gaps = gaps[:self.gaps]
+        if len(gaps):
+            print("")
+            self.output.report(self.gapHeader, gaps)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+from ..parse.interchange import openOutput
+
+
+class ChromeTrace(object):
+    """
+	Write the kernels in the Chrome trace event format (JSON), which is
+	read by chrome://tracing and https://ui.perfetto.dev.
+	Every GPU (of every rank) is a process with a track per stream, every
+	launching process has a track per thread with the launch API calls.
+	A flow arrow connects every launch to its kernel.
+	Events are written as they arrive, the trace is never held in memory.
+	Timestamps are in us from the start of the profile.
+	"""
+
+    def __init__(self, fileName):
+        self.f = openOutput(fileName)
+        self.pids = {}  #(gpu or cpu, rank, device or pid) -> trace pid
+        self.tids = set()
+        self.count = 0
+        self.f.write(b'{"displayTimeUnit": "ns", "traceEvents": [\n')
+
+    def event(self, e):
+        if self.count:
+            self.f.write(b",\n")
+        self.f.write(json.dumps(e, separators=(",", ":")).encode("utf-8"))
+        self.count += 1
+
+    def process(self, key, name):
+        """
+		Return the trace pid of a GPU or a host process, naming it on first use.
+		"""
+        pid = self.pids.get(key)
+        if pid is None:
+            pid = len(self.pids) + 1
+            self.pids[key] = pid
+            self.event({"ph": "M", "name": "process_name", "pid": pid, "args": {"name": name}})
+            self.event({"ph": "M", "name": "process_sort_index", "pid": pid, "args": {"sort_index": pid}})
+        return pid
+
+    def thread(self, pid, tid, name):
+        if (pid, tid) not in self.tids:
+            self.tids.add((pid, tid))
+            self.event({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": name}})
+
+    def add(self, d):
+        gpu = self.process(("gpu", d.rank, d.device), "Rank {} GPU {}".format(d.rank, d.device))
+        self.thread(gpu, d.stream, "Stream {}".format(d.stream))
+        cpu = self.process(("cpu", d.rank, d.pid), "Rank {} Process {}".format(d.rank, d.pid))
+        self.thread(cpu, d.tid, "Thread {}".format(d.tid))
+
+        name = d.op if d.op not in ["", "na"] else d.name
+        start = d.start / 1000.0
+        launch = (d.start - d.latency) / 1000.0
+        args = {
+            "index": d.index,
+            "kernel": d.lName,
+            "dir": d.dir,
+            "mod": d.mod,
+            "op": d.op,
+            "params": d.params,
+            "flops": d.flops,
+            "bytes": d.bytes,
+            "tc": d.tc,
+            "grid": d.grid,
+            "block": d.block,
+            "seq": d.seqId,
+            "layer": d.layer,
+        }
+
+        self.event({
+            "ph": "X", "cat": d.type, "name": name, "pid": gpu, "tid": d.stream, "ts": start, "dur": d.sil / 1000.0,
+            "args": args
+        })
+        self.event({
+            "ph": "X", "cat": "launch", "name": name, "pid": cpu, "tid": d.tid, "ts": launch, "dur": d.launch / 1000.0,
+            "args": {"index": d.index, "kernel": d.name, "queue": d.queue}
+        })
+        flow = {"cat": "launch", "name": "launch", "id": d.index}
+        self.event(dict(flow, ph="s", pid=cpu, tid=d.tid, ts=launch))
+        self.event(dict(flow, ph="f", bp="e", pid=gpu, tid=d.stream, ts=start))
+
+    def close(self):
+        self.f.write(b"\n]}\n")
+        self.f.close()
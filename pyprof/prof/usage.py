@@ -18,6 +18,8 @@
 import sys
 import argparse
 
+from ..parse.interchange import decompressed
+
 
 def parseArgs():
     """
@@ -26,8 +28,9 @@ def parseArgs():
 
     def check_cols(value):
         valid = [
-            "idx", "seq", "altseq", "tid", "layer", "trace", "dir", "sub", "mod", "op", "kernel", "params", "sil", "tc",
-            "device", "stream", "grid", "block", "flops", "bytes"
+            "idx", "seq", "altseq", "tid", "pid", "rank", "layer", "trace", "dir", "sub", "mod", "op", "kernel",
+            "params", "sil", "tc", "device", "stream", "grid", "block", "flops", "bytes", "bw", "type", "copy", "mem",
+            "launch", "latency", "queue"
         ]
         cols = value.split(",")
         for col in cols:
@@ -39,8 +42,8 @@ def parseArgs():
 
     def openFile(f):
         try:
-            d = open(f, "r")
-            return d
+            d = open(f, "rb")
+            return decompressed(d)
         except IOError:
             print("Error opening file {}. Exiting.".format(f), file=sys.stderr)
             sys.exit(1)
@@ -48,7 +51,11 @@ def parseArgs():
     parser = argparse.ArgumentParser(
         prog=sys.argv[0], description="PyTorch Profiler", formatter_class=argparse.RawTextHelpFormatter
     )
-    parser.add_argument("file", nargs='?', type=str, default=None, help="Output of parse.py (Python dictionary).")
+    parser.add_argument(
+        "file", nargs='?', type=str, default=None,
+        help="Output of parse.py (Python dictionary or binary format, optionally compressed with\n"
+        "gzip, bz2 or xz, detected automatically)."
+    )
 
     parser.add_argument(
         "-c", type=check_cols, default="idx,dir,sub,mod,op,kernel,params,sil",
@@ -57,6 +64,8 @@ idx:      Index
 seq:      PyTorch Sequence Id
 altseq:   PyTorch Alternate Sequence Id
 tid:      Thread Id
+pid:      Process Id
+rank:     Rank i.e. position of the database on the parse.py command line
 layer:    User annotated NVTX string (can be nested)
 trace:    Function Call Trace
 dir:      Direction
@@ -73,6 +82,13 @@ grid:     Grid Dimensions
 block:    Block Dimensions
 flops:    Floating point ops (FMA = 2 FLOPs)
 bytes:    Number of bytes in and out of DRAM
+bw:       Achieved bandwidth (bytes / silicon time, in GB/s)
+type:     kernel, memcpy or memset (parse.py --memory)
+copy:     Copy kind of a memcpy e.g. HtoD, DtoH, DtoD
+mem:      Host memory kind of a memcpy (pinned, pageable) or memory kind of a memset
+launch:   Duration of the launch API call (in ns)
+latency:  Time from the launch API call to the start on the GPU (in ns)
+queue:    Launch queue depth i.e. kernels launched but not started on the device at launch
 e.g. -c idx,kernel,sil'''
     )
 
@@ -80,9 +96,44 @@ e.g. -c idx,kernel,sil'''
     group.add_argument("--csv", action="store_true", default=False, help="Print a CSV output.")
     group.add_argument("-w", type=int, default=0, help="Width of columnated output.")
 
+    parser.add_argument(
+        "--summary", action="store_true", default=False,
+        help="Print totals per direction, module and op instead of one line per kernel.\n"
+        "Profiles sampled by parse.py are scaled by the sampling factor.\n"
+        "With parse.py --memory, also print the transfers per copy and memory kind\n"
+        "(e.g. pinned vs pageable) and the copy time overlapped with kernels."
+    )
+
+    parser.add_argument(
+        "--idle", type=int, nargs="?", const=10, default=None, metavar="N",
+        help="Print the GPU busy / idle time and utilization per device and stream\n"
+        "and the N (default 10) largest idle gaps with the op and trace launched last before them,\n"
+        "instead of one line per kernel."
+    )
+
+    parser.add_argument(
+        "--chrome-trace", type=str, default=None, metavar="FILE",
+        help="Also write a Chrome trace / Perfetto JSON file (gzip compressed if FILE ends with .gz)\n"
+        "with a track per GPU stream and per launching thread. Every kernel is labelled\n"
+        "with its op and carries the module, params, FLOPs and bytes."
+    )
+
+    parser.add_argument(
+        "--self-profile", action="store_true", default=False,
+        help="Print the wall time, call count and peak memory of every stage of prof.py to stderr."
+    )
+    parser.add_argument(
+        "--self-profile-json", type=str, default=None, metavar="FILE",
+        help="Also write the self profile to a JSON file. Implies --self-profile."
+    )
+
     args = parser.parse_args()
+    if (args.idle is not None) and (args.idle < 0):
+        raise parser.error("--idle must be at least 0.")
+    if args.self_profile_json is not None:
+        args.self_profile = True
     if args.file is None:
-        args.file = sys.stdin
+        args.file = decompressed(sys.stdin.buffer)
     else:
         args.file = openFile(args.file)
     return args
@@ -16,6 +16,7 @@
 # limitations under the License.
 
 from functools import reduce
+from ..parse.markers import decode
 
 
 class Utility(object):
@@ -76,7 +77,7 @@ class Utility(object):
     def hasNVTX(marker):
         if type(marker) is str:
             try:
-                marker = eval(marker)
+                marker = decode(marker)
             except:
                 return False
 
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''
+Time pyprof.parse with every marker attribution method on a synthetic profile.
+This is not run by test.sh.
+
+python benchmark.py --iters 2000
+'''
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import createNsightDB, createNvvpDB
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the marker attribution of pyprof.parse.")
+    parser.add_argument("--iters", type=int, default=1000, help="Iterations of the synthetic profile.")
+    parser.add_argument(
+        "--attribution", type=str, nargs="+", default=["sql", "rtree", "sweep"], help="Methods to compare."
+    )
+    parser.add_argument(
+        "--origin", type=int, default=1600000000000000000,
+        help="Start of the synthetic clock in ns. NVprof timestamps are ns since the epoch."
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, create in [("nsight", createNsightDB), ("nvprof", createNvvpDB)]:
+            db = os.path.join(tmpdir, name + ".sqlite")
+            create(db, iters=args.iters, origin=args.origin)
+            outputs = {}
+            for attribution in args.attribution:
+                command = [sys.executable, "-m", "pyprof.parse", "--no-cache", "--attribution", attribution, db]
+                start = time.perf_counter()
+                ret_val = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                elapsed = time.perf_counter() - start
+                assert (ret_val.returncode == 0)
+                outputs[attribution] = ret_val.stdout
+                print("{:8} {:6} {:8.2f} s".format(name, attribution, elapsed))
+            assert (len(set(outputs.values())) == 1), "The attribution methods disagree."
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''
+Micro-benchmark of the Kernel records and the output writer of pyprof.parse,
+without any database access. Every kernel is created, filled in, converted
+to a dictionary and written to /dev/null. This is not run by test.sh.
+
+python benchmark_output.py --kernels 200000
+'''
+
+import argparse
+import os
+import time
+
+from pyprof.parse.interchange import KernelWriter
+from pyprof.parse.kernel import Kernel
+
+MARKERS = (
+    ["layer:iter_0", "layer:linear"],
+    [str({'traceMarker': ["model.py:1"]})],
+    [],
+    [str({'mod': 'torch.nn.functional', 'op': 'linear', 'args': []})],
+    ["aten::linear, seq = 1"],
+    [],
+    [],
+    [1],
+    [],
+    ["iter_0", "linear"],
+)
+
+
+def run(n, fmt):
+    info = {
+        'type': "kernel", 'kNameId': 1, 'name': "gemm_kernel", 'correlationId': 1, 'start': 2000, 'end': 2100,
+        'deviceId': 0, 'streamId': 7, 'gridX': 64, 'gridY': 1, 'gridZ': 1, 'blockX': 256, 'blockY': 1, 'blockZ': 1,
+        'rStart': 1000, 'rEnd': 1010, 'pid': 1, 'tid': 2, 'objId': 3
+    }
+    Kernel.profStart = 0
+    with open(os.devnull, "wb") as f:
+        out = KernelWriter(f, fmt)
+        start = time.perf_counter()
+        for _ in range(n):
+            k = Kernel()
+            k.setKernelInfo(info)
+            k.setMarkerInfo([list(m) for m in MARKERS])
+            k.setDirection()
+            k.setOp()
+            out.write(k.toDict())
+        out.close()
+        return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Kernel records and the output writer of pyprof.parse.")
+    parser.add_argument("--kernels", type=int, default=200000, help="Number of kernels.")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of this many runs.")
+    args = parser.parse_args()
+
+    for fmt in ["text", "bin"]:
+        rate = max(run(args.kernels, fmt) for _ in range(args.repeat))
+        print("{:5} {:12.0f} kernels/s".format(fmt, rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''
+Create synthetic Nsight Systems and NVprof SQLite3 databases.
+The databases contain just the tables and columns used by pyprof.parse.
+Every iteration runs a few operators in fprop on one thread and the
+corresponding bprop on a second (autograd) thread.
+'''
+
+import sqlite3
+import struct
+
+from pyprof.nvtx.encoding import encode
+
+PID = 4242
+FPROP_TID = 11
+BPROP_TID = 12
+
+OPS = [
+    ("linear", "torch.nn.functional", "gemm_kernel", [(32, 64), (128, 64)]),
+    ("relu", "torch.nn.functional", "relu_kernel", [(32, 128)]),
+    ("add", "torch", "elementwise_kernel", [(32, 128), (32, 128)]),
+]
+
+
+def synthesize(iters=2, devices=1, json=False, memory=False, views=False, nested=False, origin=1000, queued=False):
+    """
+	Returns the markers (tid, start, end, text), launches (tid, start, end, corrId),
+	kernels (start, end, device, stream, corrId, name) and memory activities
+	(start, end, device, stream, corrId, type, bytes, copyKind, srcKind, dstKind)
+	of a synthetic profile.
+	pyprof markers are JSON encoded if json is True and str(dict) otherwise.
+	If memory is True, every iteration starts with a pinned HtoD copy on stream 8,
+	which overlaps the first fprop kernel, and a memset, and ends with a pageable
+	DtoH copy. The copy and memory kinds are the CUPTI enum values.
+	If views is True, every fprop op but the first is preceded by a view op,
+	which has a seq marker but launches no kernel.
+	If nested is True, the seq marker of every fprop op encloses the seq marker
+	(seq = 900 + n) of an op which ends before the kernel is launched.
+	The clock starts at origin ns, e.g. an epoch timestamp like nvprof.
+	If queued is True, a kernel starts once the previous kernel of the device
+	has ended, so the launches queue up on the device.
+	"""
+    fmt = encode if json else str
+
+    def argMarker(mod, op, shapes):
+        args = [{'name': '', 'type': 'tensor', 'shape': shape, 'dtype': 'float32'} for shape in shapes]
+        return fmt({'mod': mod, 'op': op, 'args': args})
+
+    markers = []
+    launches = []
+    kernels = []
+    copies = []
+    clock = [origin]
+    corrId = [0]
+    idle = {}  #device -> end of the last kernel
+    seq = 0
+
+    def tick(n=10):
+        clock[0] += n
+        return clock[0]
+
+    def launch(tid, name, device):
+        corrId[0] += 1
+        rStart = tick()
+        rEnd = tick()
+        kStart = tick(5)
+        if queued:
+            kStart = max(kStart, idle.get(device, 0))
+        kEnd = kStart + 100
+        idle[device] = kEnd
+        launches.append((tid, rStart, rEnd, corrId[0]))
+        kernels.append((kStart, kEnd, device, 7, corrId[0], name))
+
+    def copy(tid, type_, device, stream, duration, nbytes, copyKind=None, srcKind=None, dstKind=None):
+        corrId[0] += 1
+        rStart = tick()
+        rEnd = tick()
+        start = tick(5)
+        launches.append((tid, rStart, rEnd, corrId[0]))
+        copies.append((start, start + duration, device, stream, corrId[0], type_, nbytes, copyKind, srcKind, dstKind))
+
+    for it in range(iters):
+        device = it % devices
+        iterStart = tick()
+        if memory:
+            copy(FPROP_TID, "memcpy", device, 8, 1000, 1 << 20, 1, 2, 3)
+            copy(FPROP_TID, "memset", device, 7, 50, 4096, srcKind=3)
+        fprop = []
+        for i, (op, mod, kernel, shapes) in enumerate(OPS):
+            if views and i > 0:
+                seq += 1
+                start = tick()
+                markers.append((FPROP_TID, start, tick(), "aten::view, seq = {}".format(seq)))
+            seq += 1
+            fprop.append((op, kernel, seq))
+            start = tick()
+            traceStart = tick()
+            argStart = tick()
+            seqStart = tick()
+            if nested:
+                nestedMarker = (FPROP_TID, tick(), tick(), "aten::contiguous, seq = {}".format(900 + seq))
+            launch(FPROP_TID, kernel, device)
+            markers.append((FPROP_TID, seqStart, tick(), "aten::{}, seq = {}".format(op, seq)))
+            if nested:
+                markers.append(nestedMarker)
+            markers.append((FPROP_TID, argStart, tick(), argMarker(mod, op, shapes)))
+            markers.append((FPROP_TID, traceStart, tick(), fmt({'traceMarker': ["model.py:{}".format(seq)]})))
+            markers.append((FPROP_TID, start, tick(), "layer:{}".format(op)))
+        if memory:
+            copy(FPROP_TID, "memcpy", device, 7, 2000, 1 << 20, 2, 3, 1)
+        markers.append((FPROP_TID, iterStart, tick(), "layer:iter_{}".format(it)))
+
+        for op, kernel, s in reversed(fprop):
+            start = tick()
+            launch(BPROP_TID, kernel + "_backward", device)
+            name = op[0].upper() + op[1:]
+            markers.append((BPROP_TID, start, tick(), "{}Backward0, seq = {}".format(name, s)))
+
+    # Instantaneous markers have no end and never enclose a kernel.
+    markers.append((FPROP_TID, tick(), None, "mark"))
+
+    return markers, launches, kernels, copies
+
+
+def createNsightDB(
+    path, iters=2, devices=1, json=False, memory=False, views=False, nested=False, origin=1000, textIds=False,
+    queued=False
+):
+    """
+	If textIds is True, the marker text is only stored in StringIds (textId) like newer Nsight Systems exports.
+	"""
+    markers, launches, kernels, copies = synthesize(iters, devices, json, memory, views, nested, origin, queued)
+    globalPid = PID << 24
+
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute("CREATE TABLE StringIds (id INTEGER PRIMARY KEY, value TEXT NOT NULL)")
+    c.execute(
+        "CREATE TABLE NVTX_EVENTS (start INTEGER NOT NULL, end INTEGER, eventType INTEGER NOT NULL, "
+        "text TEXT, globalTid INTEGER, textId INTEGER)"
+    )
+    c.execute(
+        "CREATE TABLE CUPTI_ACTIVITY_KIND_RUNTIME (start INTEGER NOT NULL, end INTEGER NOT NULL, "
+        "globalTid INTEGER, correlationId INTEGER, nameId INTEGER)"
+    )
+    c.execute(
+        "CREATE TABLE CUPTI_ACTIVITY_KIND_KERNEL (start INTEGER NOT NULL, end INTEGER NOT NULL, "
+        "deviceId INTEGER NOT NULL, streamId INTEGER NOT NULL, correlationId INTEGER, globalPid INTEGER, "
+        "demangledName INTEGER NOT NULL, shortName INTEGER NOT NULL, gridX INTEGER NOT NULL, "
+        "gridY INTEGER NOT NULL, gridZ INTEGER NOT NULL, blockX INTEGER NOT NULL, blockY INTEGER NOT NULL, "
+        "blockZ INTEGER NOT NULL)"
+    )
+    if memory:
+        c.execute(
+            "CREATE TABLE CUPTI_ACTIVITY_KIND_MEMCPY (start INTEGER NOT NULL, end INTEGER NOT NULL, "
+            "deviceId INTEGER NOT NULL, streamId INTEGER NOT NULL, correlationId INTEGER, globalPid INTEGER, "
+            "bytes INTEGER NOT NULL, copyKind INTEGER NOT NULL, srcKind INTEGER, dstKind INTEGER)"
+        )
+        c.execute(
+            "CREATE TABLE CUPTI_ACTIVITY_KIND_MEMSET (start INTEGER NOT NULL, end INTEGER NOT NULL, "
+            "deviceId INTEGER NOT NULL, streamId INTEGER NOT NULL, correlationId INTEGER, globalPid INTEGER, "
+            "value INTEGER NOT NULL, bytes INTEGER NOT NULL, memKind INTEGER)"
+        )
+
+    strings = {}
+
+    def stringId(s):
+        if s not in strings:
+            strings[s] = len(strings) + 1
+            c.execute("INSERT INTO StringIds VALUES (?, ?)", (strings[s], s))
+        return strings[s]
+
+    for tid, start, end, text in markers:
+        eventType = 59 if end is not None else 34
+        textId = stringId(text) if textIds else None
+        text = None if textIds else text
+        c.execute(
+            "INSERT INTO NVTX_EVENTS VALUES (?, ?, ?, ?, ?, ?)", (start, end, eventType, text, globalPid + tid, textId)
+        )
+    for tid, start, end, corrId in launches:
+        c.execute(
+            "INSERT INTO CUPTI_ACTIVITY_KIND_RUNTIME VALUES (?, ?, ?, ?, ?)",
+            (start, end, globalPid + tid, corrId, stringId("cudaLaunchKernel"))
+        )
+    for start, end, device, stream, corrId, name in kernels:
+        nameId = stringId(name)
+        c.execute(
+            "INSERT INTO CUPTI_ACTIVITY_KIND_KERNEL VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (start, end, device, stream, corrId, globalPid, nameId, nameId, 64, 1, 1, 256, 1, 1)
+        )
+    for start, end, device, stream, corrId, type_, nbytes, copyKind, srcKind, dstKind in copies:
+        if type_ == "memcpy":
+            c.execute(
+                "INSERT INTO CUPTI_ACTIVITY_KIND_MEMCPY VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (start, end, device, stream, corrId, globalPid, nbytes, copyKind, srcKind, dstKind)
+            )
+        else:
+            c.execute(
+                "INSERT INTO CUPTI_ACTIVITY_KIND_MEMSET VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (start, end, device, stream, corrId, globalPid, 0, nbytes, srcKind)
+            )
+    conn.commit()
+    conn.close()
+
+
+def createNvvpDB(
+    path, iters=2, devices=1, json=False, memory=False, views=False, nested=False, origin=1000, queued=False
+):
+    markers, launches, kernels, copies = synthesize(iters, devices, json, memory, views, nested, origin, queued)
+
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute("CREATE TABLE StringTable (_id_ INTEGER PRIMARY KEY AUTOINCREMENT, value TEXT NOT NULL)")
+    c.execute(
+        "CREATE TABLE CUPTI_ACTIVITY_KIND_MARKER (_id_ INTEGER PRIMARY KEY AUTOINCREMENT, flags INT NOT NULL, "
+        "timestamp INT NOT NULL, id INT NOT NULL, objectKind INT NOT NULL, objectId BLOB NOT NULL, "
+        "name INT NOT NULL, domain INT NOT NULL)"
+    )
+    for table in ["CUPTI_ACTIVITY_KIND_RUNTIME", "CUPTI_ACTIVITY_KIND_DRIVER"]:
+        c.execute(
+            "CREATE TABLE {} (_id_ INTEGER PRIMARY KEY AUTOINCREMENT, cbid INT NOT NULL, start INT NOT NULL, "
+            "end INT NOT NULL, processId INT NOT NULL, threadId INT NOT NULL, correlationId INT NOT NULL, "
+            "returnValue INT NOT NULL)".format(table)
+        )
+    c.execute(
+        "CREATE TABLE CUPTI_ACTIVITY_KIND_CONCURRENT_KERNEL (_id_ INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "start INT NOT NULL, end INT NOT NULL, deviceId INT NOT NULL, contextId INT NOT NULL, "
+        "streamId INT NOT NULL, gridX INT NOT NULL, gridY INT NOT NULL, gridZ INT NOT NULL, "
+        "blockX INT NOT NULL, blockY INT NOT NULL, blockZ INT NOT NULL, correlationId INT NOT NULL, "
+        "name INT NOT NULL)"
+    )
+    if memory:
+        c.execute(
+            "CREATE TABLE CUPTI_ACTIVITY_KIND_MEMCPY (_id_ INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "copyKind INT NOT NULL, srcKind INT NOT NULL, dstKind INT NOT NULL, flags INT NOT NULL, "
+            "bytes INT NOT NULL, start INT NOT NULL, end INT NOT NULL, deviceId INT NOT NULL, "
+            "contextId INT NOT NULL, streamId INT NOT NULL, correlationId INT NOT NULL, "
+            "runtimeCorrelationId INT NOT NULL)"
+        )
+        c.execute(
+            "CREATE TABLE CUPTI_ACTIVITY_KIND_MEMSET (_id_ INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "value INT NOT NULL, bytes INT NOT NULL, start INT NOT NULL, end INT NOT NULL, "
+            "deviceId INT NOT NULL, contextId INT NOT NULL, streamId INT NOT NULL, "
+            "correlationId INT NOT NULL, flags INT NOT NULL, memoryKind INT NOT NULL)"
+        )
+
+    strings = {}
+
+    def stringId(s):
+        if s not in strings:
+            c.execute("INSERT INTO StringTable (value) VALUES (?)", (s, ))
+            strings[s] = c.lastrowid
+        return strings[s]
+
+    def objectId(tid):
+        return struct.pack('<i', PID) + struct.pack('<q', tid)
+
+    # CUPTI records a start (flags = 2) and an end (flags = 4) row per range.
+    # Rows are written in time order, as CUPTI would.
+    records = []
+    for i, (tid, start, end, text) in enumerate(markers):
+        if end is None:
+            records.append((start, 1, i, tid, stringId(text)))
+        else:
+            records.append((start, 2, i, tid, stringId(text)))
+            records.append((end, 4, i, tid, 0))
+    records.sort()
+    for timestamp, flags, id_, tid, name in records:
+        c.execute(
+            "INSERT INTO CUPTI_ACTIVITY_KIND_MARKER (flags, timestamp, id, objectKind, objectId, name, domain) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", (flags, timestamp, id_, 2, objectId(tid), name, 0)
+        )
+    for tid, start, end, corrId in launches:
+        c.execute(
+            "INSERT INTO CUPTI_ACTIVITY_KIND_RUNTIME (cbid, start, end, processId, threadId, correlationId, "
+            "returnValue) VALUES (?, ?, ?, ?, ?, ?, ?)", (211, start, end, PID, tid, corrId, 0)
+        )
+    for start, end, device, stream, corrId, name in kernels:
+        c.execute(
+            "INSERT INTO CUPTI_ACTIVITY_KIND_CONCURRENT_KERNEL (start, end, deviceId, contextId, streamId, "
+            "gridX, gridY, gridZ, blockX, blockY, blockZ, correlationId, name) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (start, end, device, 1, stream, 64, 1, 1, 256, 1, 1, corrId, stringId(name))
+        )
+    for start, end, device, stream, corrId, type_, nbytes, copyKind, srcKind, dstKind in copies:
+        if type_ == "memcpy":
+            c.execute(
+                "INSERT INTO CUPTI_ACTIVITY_KIND_MEMCPY (copyKind, srcKind, dstKind, flags, bytes, start, end, "
+                "deviceId, contextId, streamId, correlationId, runtimeCorrelationId) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (copyKind, srcKind, dstKind, 0, nbytes, start, end, device, 1, stream, corrId, 0)
+            )
+        else:
+            c.execute(
+                "INSERT INTO CUPTI_ACTIVITY_KIND_MEMSET (value, bytes, start, end, deviceId, contextId, streamId, "
+                "correlationId, flags, memoryKind) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (0, nbytes, start, end, device, 1, stream, corrId, 0, srcKind)
+            )
+    conn.commit()
+    conn.close()
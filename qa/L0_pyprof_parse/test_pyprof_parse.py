@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''
+This test runs pyprof.parse on synthetic Nsight Systems and NVprof databases.
+'''
+
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from pyprof.parse.db import DB
+from pyprof.parse.interchange import readKernels, decompressed
+from pyprof.parse.kernel import NameCache
+from pyprof.parse.launch import LaunchQueue
+from pyprof.parse.markers import decode, MarkerClassifier
+from pyprof.nvtx.encoding import encode
+from pyprof.parse.nsight import Nsight
+from pyprof.parse.nvvp import NVVP
+from pyprof.parse.rtree import IntervalIndex
+from pyprof.parse.sampling import iterationsFromSeq, sample
+from pyprof.parse.sweep import attribute, union
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import createNsightDB, createNvvpDB, BPROP_TID
+
+
+class TestPyProfParse(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.nsight = os.path.join(cls.tmpdir.name, "net.sqlite")
+        cls.nvvp = os.path.join(cls.tmpdir.name, "net.sql")
+        createNsightDB(cls.nsight, iters=3)
+        createNvvpDB(cls.nvvp, iters=3)
+        cls.json = os.path.join(cls.tmpdir.name, "json.sqlite")
+        createNsightDB(cls.json, iters=3, json=True)
+        cls.textIds = os.path.join(cls.tmpdir.name, "textIds.sqlite")
+        createNsightDB(cls.textIds, iters=3, textIds=True)
+        cls.serial = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def parse(self, *args):
+        if len(args) == 1 and args[0] in self.serial:
+            return self.serial[args[0]]
+        command = [sys.executable, "-m", "pyprof.parse", "--no-cache"] + list(args)
+        ret_val = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(ret_val.returncode, 0, ret_val.stderr)
+        kernels = [eval(line) for line in ret_val.stdout.splitlines()]
+        if len(args) == 1:
+            self.serial[args[0]] = kernels
+        return kernels
+
+    def test_result_cache(self):
+        db = os.path.join(self.tmpdir.name, "cached.sqlite")
+        createNsightDB(db, iters=3)
+        cacheFile = db + ".pyprof-cache"
+
+        def run(*args):
+            command = [sys.executable, "-m", "pyprof.parse"] + list(args) + [db]
+            ret_val = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+            self.assertEqual(ret_val.returncode, 0, ret_val.stderr)
+            return [eval(line) for line in ret_val.stdout.splitlines()], ret_val.stderr
+
+        expected = self.parse(self.nsight)
+
+        kernels, log = run("--no-cache")
+        self.assertEqual(kernels, expected)
+        self.assertFalse(os.path.exists(cacheFile))
+
+        kernels, log = run()
+        self.assertEqual(kernels, expected)
+        self.assertNotIn("from the cache", log)
+        self.assertTrue(os.path.exists(cacheFile))
+
+        kernels, log = run()
+        self.assertEqual(kernels, expected)
+        self.assertIn("Read 18 kernels from the cache", log)
+
+        kernels, log = run("--rebuild-cache")
+        self.assertEqual(kernels, expected)
+        self.assertNotIn("from the cache", log)
+
+        #A modified database invalidates the cache
+        os.utime(db, ns=(0, 0))
+        kernels, log = run()
+        self.assertEqual(kernels, expected)
+        self.assertNotIn("from the cache", log)
+
+    def test_attribute(self):
+        markers = [
+            (1, 0, 100, "outer"),
+            (1, 10, 20, "first"),
+            (1, 30, 90, "second"),
+            (1, 40, None, "mark"),
+            (2, 0, 100, "other thread"),
+        ]
+        launches = [(1, 35, 40), (1, 12, 15), (1, 25, 26), (1, 95, 120)]
+        result = attribute(launches, markers)
+        self.assertEqual(result[(1, 12, 15)], ("outer", "first"))
+        self.assertEqual(result[(1, 25, 26)], ("outer", ))
+        self.assertEqual(result[(1, 35, 40)], ("outer", "second"))
+        self.assertEqual(result[(1, 95, 120)], ())
+
+    def test_nsight_sweep_matches_sql(self):
+        sweep = self.parse(self.nsight)
+        sql = self.parse("--attribution", "sql", self.nsight)
+        self.assertEqual(len(sweep), 18)
+        self.assertEqual(sweep, sql)
+        self.assertEqual(self.parse("--attribution", "rtree", self.nsight), sql)
+
+    def test_nvvp_sweep_matches_sql(self):
+        sweep = self.parse(self.nvvp)
+        sql = self.parse("--attribution", "sql", self.nvvp)
+        self.assertEqual(len(sweep), 18)
+        self.assertEqual(sweep, sql)
+        self.assertEqual(self.parse("--attribution", "rtree", self.nvvp), sql)
+
+    def test_jobs(self):
+        for db in [self.nsight, self.nvvp]:
+            self.assertEqual(self.parse("--jobs", "2", db), self.parse(db))
+            self.assertEqual(self.parse("--jobs", "2", "--attribution", "sql", db), self.parse(db))
+            self.assertEqual(self.parse("--jobs", "2", "--attribution", "rtree", db), self.parse(db))
+
+    def test_columnar(self):
+        memory = os.path.join(self.tmpdir.name, "columnar.sql")
+        createNvvpDB(memory, iters=3, memory=True)
+        for db in [self.nsight, self.nvvp]:
+            self.assertEqual(self.parse("--columnar", db), self.parse(db))
+            self.assertEqual(self.parse("--columnar", "--attribution", "sql", db), self.parse(db))
+            self.assertEqual(self.parse("--columnar", "--sample-every", "2", db), self.parse("--sample-every", "2", db))
+        self.assertEqual(self.parse("--columnar", "--memory", memory), self.parse("--memory", memory))
+
+    def test_filters(self):
+        self.assertEqual(self.parse(self.textIds), self.parse(self.nsight))
+        for db in [self.nsight, self.nvvp, self.textIds]:
+            kernels = self.parse(db)
+            self.assertEqual(self.parse("--within-range", "iter_1", db), kernels[6:9])
+            self.assertEqual(
+                self.parse("--within-range", "iter_[12]", "--jobs", "2", "--attribution", "sql", db),
+                kernels[6:9] + kernels[12:15]
+            )
+            self.assertEqual(self.parse("--start-ns", "0", "--end-ns", str(10**9), db), kernels)
+            self.assertEqual(self.parse("--start-ns", str(10**9), db), [])
+        self.assertEqual(union([(5, 8), (1, 3), (2, 4), (8, 9)]), [(1, 4), (5, 9)])
+
+    def test_device_filters(self):
+        #The sequence ids depend on the previous kernel in the output, which the filters change
+        def strip(kernels):
+            return [{k: v for k, v in d.items() if k not in ["altSeqId", "subSeqId"]} for d in kernels]
+
+        for name, create in [("devices.sqlite", createNsightDB), ("devices.sql", createNvvpDB)]:
+            db = os.path.join(self.tmpdir.name, name)
+            create(db, iters=4, devices=2, memory=True)
+            kernels = strip(self.parse("--memory", db))
+            for attribution in ["sweep", "sql", "rtree"]:
+                self.assertEqual(
+                    strip(self.parse(db, "--memory", "--attribution", attribution, "--device", "1")),
+                    [k for k in kernels if k['device'] == 1]
+                )
+            self.assertEqual(strip(self.parse(db, "--memory", "--columnar", "--device", "0")),
+                             [k for k in kernels if k['device'] == 0])
+            self.assertEqual(strip(self.parse(db, "--memory", "--jobs", "2", "--tid", str(BPROP_TID))),
+                             [k for k in kernels if k['dir'] == "bprop"])
+            self.assertEqual(strip(self.parse(db, "--memory", "--stream", "8", "--device", "0", "1")),
+                             [k for k in kernels if k['stream'] == 8])
+            self.assertEqual(strip(self.parse(db, "--memory", "--pid", str(kernels[0]['pid']))), kernels)
+            self.assertEqual(self.parse(db, "--pid", "0"), [])
+
+    def test_sampling(self):
+        for db in [self.nsight, self.nvvp, self.textIds]:
+            kernels = self.parse(db)
+            expected = [dict(k, sample=1.5) for k in kernels[0:6] + kernels[12:18]]
+            self.assertEqual(self.parse("--sample-every", "2", db), expected)
+            self.assertEqual(self.parse("--sample-every", "2", "--iteration-marker", "layer:iter_", db), expected)
+            sampled = self.parse("--sample-random", "2", "--seed", "1", "--jobs", "2", db)
+            self.assertEqual(len(sampled), 12)
+            self.assertTrue(all(k['sample'] == 1.5 for k in sampled))
+
+        ranges = [(0, 1, "a, seq = 1"), (2, 3, "b, seq = 2"), (4, 5, "BBackward0, seq = 2"), (6, 7, "a, seq = 3")]
+        self.assertEqual(iterationsFromSeq(ranges), [(0, 5), (6, sys.maxsize - 1)])
+        #Checkpointing markers are ignored, the backward flag is cached in the classifier
+        classifier = MarkerClassifier()
+        ranges.insert(3, (5, 6, "CheckpointFunctionBackward, seq = 2"))
+        self.assertEqual(iterationsFromSeq(ranges, classifier), [(0, 5), (6, sys.maxsize - 1)])
+        self.assertEqual(classifier.get("BBackward0, seq = 2", ""), (MarkerClassifier.SEQ, True, 2))
+        self.assertEqual(sample([(0, 1), (2, 3), (4, 5), (6, 7)], every=3), ([(0, 1), (6, 7)], 2.0))
+
+    def test_summary(self):
+        command = [sys.executable, "-m", "pyprof.parse", "--no-cache", "--sample-every", "3", self.nsight]
+        parsed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.assertEqual(parsed.returncode, 0, parsed.stderr)
+        command = [sys.executable, "-m", "pyprof.prof", "--csv", "--summary"]
+        ret_val = subprocess.run(command, input=parsed.stdout, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.assertEqual(ret_val.returncode, 0, ret_val.stderr)
+        rows = [line.replace('"', '').split(",") for line in ret_val.stdout.decode().splitlines()]
+        self.assertEqual(rows[0], ["Direction", "Module", "Op", "Count", "Sil(ns)", "FLOPs", "Bytes"])
+        #1 of 3 iterations is parsed and scaled by 3
+        self.assertEqual(rows[-1][:5], ["Total", "-", "-", "18", "1800"])
+
+    def test_ranks(self):
+        rankDir = os.path.join(self.tmpdir.name, "ranks")
+        os.mkdir(rankDir)
+        for rank, iters in [(0, 3), (1, 2), (10, 1)]:
+            createNsightDB(os.path.join(rankDir, "net{}.sqlite".format(rank)), iters=iters)
+
+        kernels = self.parse(os.path.join(rankDir, "net*.sqlite"))
+        self.assertEqual([k['rank'] for k in kernels], [0] * 18 + [1] * 12 + [2] * 6)
+        self.assertEqual([{k: v for k, v in d.items() if k != 'rank'} for d in kernels[:18]], self.parse(self.nsight))
+        #Two ranks at a time
+        self.assertEqual(self.parse("--jobs", "2", os.path.join(rankDir, "net*.sqlite")), kernels)
+
+        command = [sys.executable, "-m", "pyprof.prof", "--csv", "--summary"]
+        text = "\n".join(str(k) for k in kernels)
+        ret_val = subprocess.run(command, input=text, stdout=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(ret_val.returncode, 0)
+        rows = [line.replace('"', '').split(",") for line in ret_val.stdout.splitlines()]
+        self.assertEqual(rows[7], ["Total", "-", "-", "36", "3600", "6365184", "1228800", "600", "1800", "1.50"])
+        self.assertEqual([r[:2] for r in rows[-3:]], [["0", "18"], ["1", "12"], ["2", "6"]])
+
+    def test_memory(self):
+        for name, create in [("memory.sqlite", createNsightDB), ("memory.sql", createNvvpDB)]:
+            db = os.path.join(self.tmpdir.name, name)
+            create(db, iters=3, memory=True)
+
+            #Without --memory the memcpys and memsets are ignored
+            self.assertEqual(len(self.parse(db)), 18)
+
+            records = self.parse("--memory", db)
+            self.assertEqual(len(records), 27)
+            self.assertEqual([r['start'] for r in records], sorted(r['start'] for r in records))
+            copies = [r for r in records if r.get('type') == "memcpy"]
+            self.assertEqual([(r['copyKind'], r['hostMem']) for r in copies[:2]], [("HtoD", "pinned"),
+                                                                                    ("DtoH", "pageable")])
+            self.assertEqual(copies[0]['kShortName'], "[CUDA memcpy HtoD]")
+            self.assertEqual(copies[0]['bytes'], 1 << 20)
+            self.assertEqual(copies[1]['bandwidth'], 524.288)
+            #Attributed to the enclosing NVTX range like a kernel
+            self.assertEqual(copies[0]['layer'], ["iter_0"])
+            memsets = [r for r in records if r.get('type') == "memset"]
+            self.assertEqual(len(memsets), 3)
+            self.assertEqual(memsets[0]['hostMem'], "device")
+
+        command = [sys.executable, "-m", "pyprof.prof", "--csv", "--summary"]
+        text = "\n".join(str(r) for r in records)
+        ret_val = subprocess.run(command, input=text, stdout=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(ret_val.returncode, 0)
+        rows = [line.replace('"', '').split(",") for line in ret_val.stdout.splitlines()]
+        self.assertIn(["memcpy", "HtoD", "pinned", "3", "3145728", "3000", "1048.58"], rows)
+        self.assertIn(["memcpy", "DtoH", "pageable", "3", "3145728", "6000", "524.29"], rows)
+        self.assertEqual(rows[-2], ["Rank", "Device", "Memcpy(ns)", "Overlap(ns)", "Overlap(%)"])
+        self.assertEqual(rows[-1][:2], ["0", "0"])
+        self.assertGreater(int(rows[-1][3]), 0)
+
+    def test_idle(self):
+        command = [sys.executable, "-m", "pyprof.prof", "--csv", "--idle", "2"]
+        text = "\n".join(str(k) for k in self.parse(self.nsight))
+        ret_val = subprocess.run(command, input=text, stdout=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(ret_val.returncode, 0)
+        rows = [line.replace('"', '').split(",") for line in ret_val.stdout.splitlines()]
+        #Kernels of 100 ns, fprop kernels are launched 105 ns apart
+        self.assertEqual(rows[1], ["0", "0", "all", "1395", "30", "97.9"])
+        self.assertEqual(rows[2][2], "7")
+        self.assertEqual(rows[4], ["Rank", "Device", "Start(ns)", "Idle(ns)", "Direction", "Op", "Trace"])
+        #The gap follows the linear kernel on the GPU, but relu was launched (170 - 15 ns) before it
+        self.assertEqual(rows[5], ["0", "0", "165", "5", "fprop", "relu", "model.py:2"])
+        self.assertEqual(len(rows), 7)
+
+    def test_chrome_trace(self):
+        kernels = self.parse(self.nsight)
+        path = os.path.join(self.tmpdir.name, "trace.json")
+        command = [sys.executable, "-m", "pyprof.prof", "--csv", "--chrome-trace", path]
+        text = "\n".join(str(k) for k in kernels)
+        ret_val = subprocess.run(command, input=text, stdout=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(ret_val.returncode, 0)
+        with open(path) as f:
+            events = json.load(f)['traceEvents']
+
+        names = {e['pid']: e['args']['name'] for e in events if e['name'] == "process_name"}
+        self.assertEqual(sorted(names.values()), ["Rank 0 GPU 0", "Rank 0 Process {}".format(kernels[0]['pid'])])
+        slices = [e for e in events if e['ph'] == "X"]
+        gpu = [e for e in slices if e['cat'] == "kernel"]
+        launches = [e for e in slices if e['cat'] == "launch"]
+        self.assertEqual((len(gpu), len(launches)), (18, 18))
+        self.assertEqual(names[gpu[0]['pid']], "Rank 0 GPU 0")
+        self.assertEqual(gpu[0]['name'], "linear")
+        self.assertEqual(gpu[0]['args']['mod'], "torch.nn.functional")
+        self.assertEqual((gpu[0]['ts'], gpu[0]['dur']), (kernels[0]['start'] / 1000.0, 0.1))
+        self.assertEqual(launches[0]['ts'], (kernels[0]['start'] - kernels[0]['latency']) / 1000.0)
+        self.assertEqual(launches[0]['tid'], kernels[0]['tid'])
+        flows = [e for e in events if e['ph'] in "sf"]
+        self.assertEqual(len(flows), 36)
+
+    def test_launch_queue(self):
+        for k in self.parse(self.nsight):
+            self.assertEqual((k['launch'], k['latency'], k['queueDepth']), (10, 15, 0))
+        self.assertEqual(self.parse("--no-queue-depth", self.nsight), self.parse(self.nsight))
+
+        #A device runs one kernel at a time. The queue depth counts all kernels, not only the selected ones.
+        for name, create in [("queued.sqlite", createNsightDB), ("queued.sql", createNvvpDB)]:
+            db = os.path.join(self.tmpdir.name, name)
+            create(db, iters=4, devices=2, queued=True)
+            depths = {(k['device'], k['start']): k['queueDepth'] for k in self.parse(db)}
+            self.assertGreater(max(depths.values()), 0)
+            for args in [
+                ("--within-range", "iter_[13]"), ("--start-ns", "1500"), ("--device", "1"), ("--tid", "11"),
+                ("--sample-every", "2"), ("--columnar", "--device", "0"), ("--jobs", "2", "--tid", "12")
+            ]:
+                kernels = self.parse(db, *args)
+                self.assertTrue(0 < len(kernels) < len(depths))
+                expected = [depths[(k['device'], k['start'])] for k in kernels]
+                self.assertEqual([k['queueDepth'] for k in kernels], expected)
+
+        #Three launches at 0, 10, 20 which start at 100, 200, 300 on device 0
+        queue = LaunchQueue(([0, 0, 0, 1], [0, 10, 20, 5]), ([0, 0, 0, 1], [100, 200, 300, 6]))
+        self.assertEqual([queue.depth(0, t) for t in [0, 10, 20, 150, 250]], [0, 1, 2, 2, 1])
+        self.assertEqual(queue.depth(1, 10), 0)
+        self.assertEqual(queue.depth(2, 10), 0)
+
+    def test_alt_seq(self):
+        nsight = os.path.join(self.tmpdir.name, "views.sqlite")
+        nvvp = os.path.join(self.tmpdir.name, "views.sql")
+        createNsightDB(nsight, iters=3, views=True)
+        createNvvpDB(nvvp, iters=3, views=True)
+        expected = self.parse(nvvp)
+        #The view ops between two fprop kernels launch no kernel
+        self.assertEqual([k['altSeqId'] for k in expected[:6]], [[], [2], [4], [], [], []])
+        for args in [(), ("--attribution", "sql"), ("--attribution", "rtree"), ("--jobs", "2")]:
+            kernels = self.parse(*(args + (nsight, )))
+            self.assertEqual([(k['seqId'], k['altSeqId']) for k in kernels],
+                             [(k['seqId'], k['altSeqId']) for k in expected])
+
+    def test_alt_seq_pruned(self):
+        nsight = os.path.join(self.tmpdir.name, "nested.sqlite")
+        nvvp = os.path.join(self.tmpdir.name, "nested.sql")
+        createNsightDB(nsight, iters=3, views=True, nested=True)
+        createNvvpDB(nvvp, iters=3, views=True, nested=True)
+        expected = self.parse(nvvp)
+        #The nested seq markers ended before the previous kernel of the thread was launched
+        self.assertEqual([k['altSeqId'] for k in expected[:6]], [[], [2], [4], [], [], []])
+        for args in [(), ("--attribution", "sql"), ("--attribution", "rtree"), ("--jobs", "2"), ("--columnar", )]:
+            kernels = self.parse(*(args + (nsight, )))
+            self.assertEqual([(k['seqId'], k['altSeqId']) for k in kernels],
+                             [(k['seqId'], k['altSeqId']) for k in expected])
+
+    def test_compression(self):
+        expected = self.parse(self.nsight)
+        for ext in ["gz", "bz2", "xz"]:
+            out = os.path.join(self.tmpdir.name, "net.dict." + ext)
+            command = [sys.executable, "-m", "pyprof.parse", "--no-cache", "-o", out, self.nsight]
+            self.assertEqual(subprocess.run(command, stderr=subprocess.PIPE).returncode, 0)
+            with open(out, "rb") as f:
+                self.assertEqual(list(readKernels(decompressed(f))), expected)
+
+        command = [
+            sys.executable, "-m", "pyprof.parse", "--no-cache", "--format", "bin", "--compress", "xz", self.nsight
+        ]
+        ret_val = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.assertEqual(ret_val.returncode, 0)
+        self.assertEqual(list(readKernels(decompressed(io.BufferedReader(io.BytesIO(ret_val.stdout))))), expected)
+
+    def test_checkpoint(self):
+        #Interrupt the run after 13 kernels, the last checkpoint is after 10
+        interrupt = (
+            "import sys\n"
+            "import pyprof.parse.parse as parse\n"
+            "sequenceKernel = parse.sequenceKernel\n"
+            "seen = []\n"
+            "def interrupted(k, state):\n"
+            "    seen.append(k)\n"
+            "    if len(seen) > 13:\n"
+            "        raise RuntimeError('interrupted')\n"
+            "    sequenceKernel(k, state)\n"
+            "parse.sequenceKernel = interrupted\n"
+            "sys.argv = ['parse'] + sys.argv[1:]\n"
+            "parse.main()\n"
+        )
+        for db, args in [(self.nsight, ()), (self.nvvp, ("--attribution", "sql")), (self.nvvp, ("--format", "bin"))]:
+            out = os.path.join(self.tmpdir.name, "checkpoint.out")
+            args = ("--no-cache", "-o", out) + args + (db, )
+            command = [sys.executable, "-c", interrupt, "--checkpoint-every", "5"] + list(args)
+            self.assertNotEqual(subprocess.run(command, stderr=subprocess.PIPE).returncode, 0)
+            with open(out + ".pyprof-checkpoint") as f:
+                self.assertEqual(json.load(f)['kernels'], 10)
+
+            #Anything written after the checkpoint is discarded
+            with open(out, "ab") as f:
+                f.write(b"partial")
+            command = [sys.executable, "-m", "pyprof.parse", "--resume"] + list(args)
+            self.assertEqual(subprocess.run(command, stderr=subprocess.PIPE).returncode, 0)
+            self.assertFalse(os.path.exists(out + ".pyprof-checkpoint"))
+            with open(out, "rb") as f:
+                self.assertEqual(list(readKernels(io.BufferedReader(f))), self.parse(db))
+
+    def test_marker_classifier(self):
+        classifier = MarkerClassifier()
+        self.assertEqual(classifier.get(1, "layer:conv1"), (MarkerClassifier.LAYER, False, "conv1"))
+        self.assertEqual(classifier.get(2, "ReluBackward0, seq = 7"), (MarkerClassifier.SEQ, True, 7))
+        self.assertEqual(classifier.get(3, "CheckpointFunctionBackward"), (MarkerClassifier.IGNORE, False, None))
+        self.assertEqual(classifier.get(4, str({'traceMarker': []}))[0], MarkerClassifier.TRACE)
+        self.assertEqual(classifier.get(5, "mark")[0], MarkerClassifier.OTHER)
+        #Classified once per key
+        self.assertEqual(classifier.get(1, "anything"), (MarkerClassifier.LAYER, False, "conv1"))
+        self.assertEqual(len(classifier.cache), 5)
+
+    def test_self_profile(self):
+        parseJson = os.path.join(self.tmpdir.name, "parse.json")
+        profJson = os.path.join(self.tmpdir.name, "prof.json")
+        command = [
+            sys.executable, "-m", "pyprof.parse", "--no-cache", "--attribution", "sql", "--self-profile-json",
+            parseJson, self.nvvp
+        ]
+        parsed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.assertEqual(parsed.returncode, 0, parsed.stderr)
+        self.assertIn(b"Self profile of parse", parsed.stderr)
+        command = [sys.executable, "-m", "pyprof.prof", "--self-profile-json", profJson]
+        ret_val = subprocess.run(command, input=parsed.stdout, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.assertEqual(ret_val.returncode, 0, ret_val.stderr)
+
+        with open(parseJson) as f:
+            stages = json.load(f)['stages']
+        for name in ["kernel query", "marker query", "classification", "seqId heuristics", "output", "other"]:
+            self.assertIn(name, stages)
+        self.assertEqual(stages['classification']['calls'], 18)
+        with open(profJson) as f:
+            stages = json.load(f)['stages']
+        self.assertEqual(stages['operator analysis']['calls'], 18)
+        self.assertEqual(stages['input']['calls'], 19)
+
+    def test_binary_format(self):
+        for db in [self.nsight, self.nvvp]:
+            command = [sys.executable, "-m", "pyprof.parse", "--no-cache", "--format", "bin", db]
+            ret_val = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self.assertEqual(ret_val.returncode, 0, ret_val.stderr)
+            kernels = list(readKernels(io.BufferedReader(io.BytesIO(ret_val.stdout))))
+            self.assertEqual(kernels, self.parse(db))
+
+            #The text format is detected as well
+            text = "\n".join(str(k) for k in kernels).encode("utf-8")
+            self.assertEqual(list(readKernels(io.BufferedReader(io.BytesIO(text)))), kernels)
+
+    def test_decode(self):
+        d = {'mod': 'torch', 'op': 'cat', 'args': [{'name': '', 'type': 'tuple', 'value': (1, 2)}]}
+        d['args'].append({'name': '', 'type': 'tensor', 'shape': (32, 3), 'dtype': 'float16'})
+        self.assertTrue(encode(d).startswith("@pyprof1:"))
+        self.assertEqual(decode(encode(d)), d)
+        self.assertEqual(decode(str(d)), d)
+        self.assertIs(decode(str(d)), decode(str(d)))
+
+    def test_json_markers(self):
+        legacy = self.parse(self.nsight)
+        kernels = self.parse(self.json)
+        self.assertEqual(len(kernels), len(legacy))
+        for k, l in zip(kernels, legacy):
+            k, l = dict(k), dict(l)
+            self.assertEqual([decode(m) for m in k.pop('marker')], [decode(m) for m in l.pop('marker')])
+            self.assertEqual(k, l)
+
+    def test_iter_select(self):
+        db = DB(self.nsight)
+        cmd = "SELECT * FROM CUPTI_ACTIVITY_KIND_KERNEL"
+        self.assertEqual(list(db.iter_select(cmd, size=4)), db.select(cmd))
+        db.close()
+
+    def test_db_access(self):
+        db = DB(self.nsight, readOnly=True, mmapSize=1 << 20, cacheSize=-1024, tempStore="MEMORY")
+        self.assertEqual(db.select("PRAGMA temp_store")[0]['temp_store'], 2)
+        cmd = "SELECT correlationId FROM CUPTI_ACTIVITY_KIND_KERNEL WHERE start > ? ORDER BY start"
+        self.assertEqual(len(db.select(cmd, (0, ))), 18)
+        self.assertEqual(list(db.iter_select(cmd, (0, ), size=4)), db.select(cmd, (0, )))
+        self.assertEqual(Nsight(db).getProfileStart(), 1010)
+
+        #Temporary tables can be created in read-only mode, but the profile cannot be modified
+        db.execute("CREATE TEMPORARY TABLE t AS SELECT * FROM CUPTI_ACTIVITY_KIND_KERNEL")
+        with self.assertRaises(SystemExit):
+            db.execute("DELETE FROM CUPTI_ACTIVITY_KIND_KERNEL")
+        db.close()
+
+        db = DB(self.nvvp, readOnly=True)
+        self.assertEqual(NVVP(db).getProfileStart(), 1010)
+        db.close()
+
+    def test_interval_index(self):
+        db = DB(":memory:")
+        db.execute("CREATE TABLE marker (tid INTEGER, start INTEGER, end INTEGER, text TEXT)")
+        #Epoch timestamps are not exact in the 32 bit floats of the R*Tree, offsets from the first marker are
+        t = 1600000000000000000
+        rows = [
+            (7, t, t + 100, "outer"), (7, t + 10, t + 20, "inner"), (7, t + 1, t + 99, "miss"), (8, t, t + 100, "x"),
+            (7, t + 10**9, t + 10**9 + 100, "later")
+        ]
+        for row in rows:
+            db.insert("INSERT INTO marker VALUES (?, ?, ?, ?)", row)
+        index = IntervalIndex(db, "marker", "tid", "start", "end")
+        self.assertEqual([r['text'] for r in index.enclosing("text", 7, t + 11, t + 19)], ["outer", "miss", "inner"])
+        self.assertEqual([r['text'] for r in index.enclosing("text", 7, t + 1, t + 19)], ["outer"])
+        self.assertEqual(index.enclosing("text", 9, t + 11, t + 19), [])
+        #The R*Tree alone excludes the marker one second later
+        cmd = "SELECT id FROM {} WHERE minTime < ? AND maxTime > ?".format(index.rtree)
+        self.assertEqual(len(db.select(cmd, (11, 19))), 4)
+        db.close()
+
+    def test_name_cache(self):
+        path = os.path.join(self.tmpdir.name, "cache", "names.sqlite")
+        mangled = "_ZN2at6native18elementwise_kernelEi"
+        for diskHits, misses in [(0, 1), (1, 0)]:
+            names = NameCache(path)
+            for _ in range(3):
+                longName, shortName = names.get(7, mangled)
+            self.assertEqual(longName, "at::native::elementwise_kernel(int)")
+            self.assertEqual(shortName, "elementwise_kernel")
+            self.assertEqual(names.stats(), {'hits': 2, 'diskHits': diskHits, 'misses': misses})
+            names.close()
+
+    def test_nvvp_strings(self):
+        db = DB(self.nvvp)
+        nvvp = NVVP(db)
+        db.close()
+        self.assertEqual(nvvp.getString(1), "aten::linear, seq = 1")
+        self.assertEqual(nvvp.stringLookups, 1)
+
+    def test_markers(self):
+        for db in [self.nsight, self.nvvp]:
+            kernels = self.parse(db)
+            fprop = kernels[0]
+            self.assertEqual(fprop['dir'], "fprop")
+            self.assertEqual(fprop['layer'], ["iter_0", "linear"])
+            self.assertEqual(fprop['op'], ["linear"])
+            self.assertEqual(fprop['seqId'], [1])
+            self.assertEqual(fprop['trace'], ["model.py:1"])
+            bprop = kernels[3]
+            self.assertEqual(bprop['dir'], "bprop")
+            self.assertEqual(bprop['seqId'], [3])
+
+
+if __name__ == '__main__':
+    unittest.main()
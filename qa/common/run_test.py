@@ -20,7 +20,7 @@ This is a test script to run the L0 tests.
 import unittest
 import sys
 
-test_dirs = ["run_pyprof_nvtx", "run_pyprof_data"]
+test_dirs = ["run_pyprof_nvtx", "run_pyprof_data", "run_pyprof_parse"]
 
 runner = unittest.TextTestRunner(verbosity=2)
 